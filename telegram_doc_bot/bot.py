@@ -1,33 +1,87 @@
 """
 Главный файл Telegram бота для генерации документов.
-Инициализирует бота, подключает обработчики и запускает polling.
+Инициализирует бота, подключает обработчики и запускает polling
+или webhook-сервер (если задан WEBHOOK_URL).
 """
 
 import asyncio
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import urlsplit
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+try:
+    import uvloop
+except ImportError:  # uvloop недоступен на Windows
+    uvloop = None
 
 from telegram_doc_bot.config import Config
 from telegram_doc_bot.services import GeminiService, DocumentService
+from telegram_doc_bot.middlewares import ConcurrencyLimitMiddleware, RateLimitMiddleware
 from telegram_doc_bot.handlers import basic_handlers, document_handlers, api_key_handlers, advanced_handlers
 from telegram_doc_bot.utils.user_storage import UserStorage
 
-# Настройка логирования
+# Настройка логирования: event loop только кладёт записи в очередь,
+# запись в stdout и файл выполняется в отдельном потоке QueueListener
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(
+    log_queue,
+    logging.StreamHandler(sys.stdout),
+    logging.FileHandler('bot.log', encoding='utf-8')
+)
+
 logging.basicConfig(
-    level=logging.INFO,
+    level=Config.LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('bot.log', encoding='utf-8')
-    ]
+    handlers=[QueueHandler(log_queue)]
 )
 
 logger = logging.getLogger(__name__)
 
 
+async def run_webhook(bot: Bot, dp: Dispatcher, **workflow_data):
+    """
+    Запуск бота в режиме webhook
+    
+    Args:
+        bot: Экземпляр бота
+        dp: Диспетчер с зарегистрированными обработчиками
+        **workflow_data: Зависимости, передаваемые в обработчики
+    """
+    await bot.set_webhook(
+        Config.WEBHOOK_URL,
+        allowed_updates=dp.resolve_used_update_types(),
+        secret_token=Config.WEBHOOK_SECRET
+    )
+    
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=Config.WEBHOOK_SECRET,
+        **workflow_data
+    ).register(app, path=urlsplit(Config.WEBHOOK_URL).path or "/")
+    setup_application(app, dp, bot=bot, **workflow_data)
+    
+    # AppRunner вместо web.run_app, чтобы сервер работал в уже запущенном event loop
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=Config.WEBAPP_HOST, port=Config.WEBAPP_PORT)
+    await site.start()
+    logger.info(f"Webhook-сервер слушает {Config.WEBAPP_HOST}:{Config.WEBAPP_PORT}")
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
 async def main():
     """Главная функция для запуска бота"""
     
@@ -41,13 +95,21 @@ async def main():
             token=Config.TELEGRAM_BOT_TOKEN,
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
+        # Исходящие сообщения придерживаются до отправки, чтобы не получать 429
+        bot.session.middleware(RateLimitMiddleware(
+            global_rate=Config.RATE_LIMIT_GLOBAL,
+            chat_rate=Config.RATE_LIMIT_PER_CHAT,
+            chat_burst=Config.RATE_LIMIT_CHAT_BURST
+        ))
         
         # Создание диспетчера
         dp = Dispatcher()
+        dp.update.outer_middleware(ConcurrencyLimitMiddleware(Config.MAX_CONCURRENT_UPDATES))
         
         # Инициализация сервисов
         document_service = DocumentService(output_dir=Config.TEMP_DIR)
         user_storage = UserStorage()
+        dp.shutdown.register(user_storage.close)
         
         logger.info("Сервисы инициализированы")
         
@@ -64,10 +126,23 @@ async def main():
         logger.info(f"Бот запущен: @{bot_info.username}")
         logger.info(f"ID бота: {bot_info.id}")
         
-        # Запуск polling
+        if Config.WEBHOOK_URL:
+            logger.info("Запуск в режиме webhook...")
+            await run_webhook(
+                bot,
+                dp,
+                document_service=document_service,
+                user_storage=user_storage
+            )
+            return
+        
+        # Запуск polling (снимаем webhook, если он остался от прошлого запуска)
+        await bot.delete_webhook()
         logger.info("Начало polling...")
         await dp.start_polling(
             bot,
+            polling_timeout=Config.POLLING_TIMEOUT,
+            handle_as_tasks=True,
             document_service=document_service,
             user_storage=user_storage,
             allowed_updates=dp.resolve_used_update_types()
@@ -84,6 +159,11 @@ async def main():
 
 
 if __name__ == '__main__':
+    # Быстрый event loop на базе libuv, если доступен
+    if uvloop is not None:
+        uvloop.install()
+    
+    log_listener.start()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -91,3 +171,6 @@ if __name__ == '__main__':
     except Exception as e:
         logger.error(f"Неожиданная ошибка: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        # Дописываем оставшиеся в очереди записи перед выходом
+        log_listener.stop()
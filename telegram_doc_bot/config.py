@@ -3,13 +3,32 @@
 Загружает переменные окружения и настройки приложения.
 """
 
+import logging
 import os
+from types import MappingProxyType
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
 
 
+def _log_level(name: str) -> str:
+    """
+    Проверка уровня логирования из окружения
+    
+    Args:
+        name: Имя уровня (DEBUG, INFO, WARNING, ...)
+    
+    Returns:
+        Имя уровня в верхнем регистре или INFO, если уровень неизвестен
+    """
+    level = name.upper()
+    if isinstance(logging.getLevelName(level), int):
+        return level
+    logging.getLogger(__name__).warning("Неизвестный LOG_LEVEL %r, используется INFO", name)
+    return 'INFO'
+
+
 class Config:
     """Класс для хранения конфигурации приложения"""
     
@@ -19,14 +38,45 @@ class Config:
     # API ключ Google Gemini
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     
+    # Уровень логирования (DEBUG включает трассировку действий пользователей)
+    LOG_LEVEL = _log_level(os.getenv('LOG_LEVEL', 'INFO'))
+    
     # Директория для временных файлов
     TEMP_DIR = 'generated_docs'
     
     # Максимальная длина запроса пользователя
     MAX_REQUEST_LENGTH = 1000
     
+    # Таймаут long polling для getUpdates (секунды)
+    POLLING_TIMEOUT = 30
+    
+    # Максимум одновременно обрабатываемых обновлений
+    MAX_CONCURRENT_UPDATES = 32
+    
+    # Лимиты Telegram на исходящие сообщения (в секунду): на бота и на чат,
+    # а также сколько сообщений подряд можно отправить в чат без ожидания
+    RATE_LIMIT_GLOBAL = 30
+    RATE_LIMIT_PER_CHAT = 1
+    RATE_LIMIT_CHAT_BURST = 5
+    
+    # Максимум одновременных запросов к Gemini API на процесс
+    GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '16'))
+    
+    # Таймаут ожидания ответа Gemini API (секунды); при потоковой
+    # генерации действует на каждый фрагмент
+    GEMINI_TIMEOUT = 30
+    
+    # Режим webhook: если WEBHOOK_URL задан, бот принимает обновления
+    # через HTTP-сервер aiohttp вместо polling
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+    WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', '8080'))
+    
+    # Справочники ниже обёрнуты в MappingProxyType и доступны только для чтения
+    
     # Шаблоны документов
-    DOCUMENT_TEMPLATES = {
+    DOCUMENT_TEMPLATES = MappingProxyType({
         'contract': '📜 Договор',
         'statement': '📋 Заявление',
         'resume': '👔 Резюме',
@@ -37,31 +87,31 @@ class Config:
         'protocol': '📝 Протокол',
         'instruction': '📖 Инструкция',
         'custom': '📄 Произвольный документ'
-    }
+    })
     
     # Типы документов
-    DOCUMENT_TYPES = {
+    DOCUMENT_TYPES = MappingProxyType({
         'docx': '📘 Word документ (.docx)',
         'pdf': '📕 PDF документ (.pdf)'
-    }
+    })
     
     # Языки документов
-    DOCUMENT_LANGUAGES = {
+    DOCUMENT_LANGUAGES = MappingProxyType({
         'ru': '🇷🇺 Русский',
         'en': '🇬🇧 Английский',
         'de': '🇩🇪 Немецкий',
         'es': '🇪🇸 Испанский',
         'fr': '🇫🇷 Французский',
         'zh': '🇨🇳 Китайский'
-    }
+    })
     
     # Стили документов
-    DOCUMENT_STYLES = {
+    DOCUMENT_STYLES = MappingProxyType({
         'formal': '🎩 Официальный',
         'business': '💼 Деловой',
         'casual': '😊 Неформальный',
         'technical': '🔧 Технический'
-    }
+    })
     
     # Лимиты
     MAX_HISTORY_ITEMS = 20
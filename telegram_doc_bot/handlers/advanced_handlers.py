@@ -3,105 +3,161 @@
 """
 
 import logging
-from datetime import datetime
+import time
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from telegram_doc_bot.utils.keyboards import (
-    get_main_keyboard,
     get_settings_keyboard,
     get_language_keyboard,
     get_style_keyboard,
     get_history_item_keyboard
 )
 from telegram_doc_bot.utils.user_storage import UserStorage
-from telegram_doc_bot.utils.message_helpers import safe_edit_message
+from telegram_doc_bot.utils.message_helpers import safe_edit_message, answer_with_keyboard
 from telegram_doc_bot.config import Config
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Локальные ссылки на справочники Config для горячих обработчиков
+_LANGS = Config.DOCUMENT_LANGUAGES
+_STYLES = Config.DOCUMENT_STYLES
 
-@router.message(F.text == "📚 История")
-async def show_history(message: Message, user_storage: UserStorage):
+# callback_data кнопок выбора языка и стиля (см. utils/keyboards.py):
+# проверка по множеству вместо startswith и разбора через split
+_LANG_PREFIX = "lang_"
+_STYLE_PREFIX = "style_"
+_LANG_CALLBACKS = frozenset(_LANG_PREFIX + key for key in _LANGS)
+_STYLE_CALLBACKS = frozenset(_STYLE_PREFIX + key for key in _STYLES)
+
+# Статические тексты сообщений
+_EMPTY_HISTORY_TEXT = (
+    "📚 <b>История документов</b>\n\n"
+    "У вас пока нет созданных документов.\n\n"
+    "Нажмите \"📝 Создать документ\", чтобы начать!"
+)
+
+_EMPTY_FAVORITES_TEXT = (
+    "⭐ <b>Избранные документы</b>\n\n"
+    "У вас пока нет избранных документов.\n\n"
+    "После создания документа нажмите \"⭐ В избранное\", "
+    "чтобы сохранить его в этом разделе."
+)
+
+_SETTINGS_TMPL = (
+    "⚙️ <b>Настройки</b>\n\n"
+    "🌍 Язык документа: <b>{lang}</b>\n"
+    "🎨 Стиль документа: <b>{style}</b>\n"
+    "🔔 Уведомления: <b>{notif}</b>\n\n"
+    "Выберите, что хотите изменить:"
+)
+
+
+# Достижения: (условие по статистике, строка для вывода)
+_ACHIEVEMENTS = (
+    (lambda s: s.get('total_documents', 0) >= 10, "🏆 Создано 10+ документов\n"),
+    (lambda s: s.get('total_documents', 0) >= 50, "🏆 Создано 50+ документов\n"),
+    (lambda s: s.get('total_edits', 0) >= 20, "✨ Мастер редактирования\n"),
+    (lambda s: s.get('total_words', 0) >= 10000, "📚 Написано 10,000+ слов\n"),
+)
+
+
+# Кэш отметки времени с точностью до минуты: [номер минуты, строка]
+_ts_cache = [0, ""]
+
+
+def _current_minute() -> str:
+    """Текущее время в формате "%Y-%m-%d %H:%M", форматируется не чаще раза в минуту"""
+    now = time.time()
+    bucket = int(now // 60)
+    if bucket != _ts_cache[0]:
+        _ts_cache[:] = [bucket, time.strftime("%Y-%m-%d %H:%M", time.localtime(now))]
+    return _ts_cache[1]
+
+
+def _render_settings(settings: dict) -> str:
+    """Формирование текста экрана настроек"""
+    return _SETTINGS_TMPL.format(
+        lang=_LANGS.get(settings.get('language', 'ru'), '🇷🇺 Русский'),
+        style=_STYLES.get(settings.get('style', 'formal'), '🎩 Официальный'),
+        notif="✅ Включены" if settings.get('notifications', True) else "❌ Выключены"
+    )
+
+
+async def show_history(message: Message, user_storage: UserStorage, state: FSMContext):
     """Показать историю созданных документов"""
     user_id = message.from_user.id
-    history = user_storage.get_history(user_id)
+    history = await user_storage.get_history(user_id)
     
     if not history:
-        await message.answer(
-            "📚 <b>История документов</b>\n\n"
-            "У вас пока нет созданных документов.\n\n"
-            "Нажмите \"📝 Создать документ\", чтобы начать!",
-            parse_mode="HTML",
-            reply_markup=get_main_keyboard()
+        await answer_with_keyboard(
+            message,
+            _EMPTY_HISTORY_TEXT,
+            state=state,
+            keyboard="main"
         )
         return
     
-    text = "📚 <b>История ваших документов</b>\n\n"
-    for i, doc in enumerate(history[-10:], 1):
-        date = doc.get('date', 'Неизвестно')
-        template = doc.get('template_name', 'Документ')
-        doc_type = doc.get('doc_type', 'docx')
-        
-        text += f"{i}. <b>{template}</b>\n"
-        text += f"   📅 {date}\n"
-        text += f"   📄 Формат: {doc_type.upper()}\n\n"
-    
-    text += f"📊 Всего документов: {len(history)}"
+    parts = ["📚 <b>История ваших документов</b>\n\n"]
+    parts.extend(
+        f"{i}. <b>{doc.get('template_name', 'Документ')}</b>\n"
+        f"   📅 {doc.get('date', 'Неизвестно')}\n"
+        f"   📄 Формат: {doc.get('doc_type', 'docx').upper()}\n\n"
+        for i, doc in enumerate(history[-10:], 1)
+    )
+    parts.append(f"📊 Всего документов: {len(history)}")
+    text = "".join(parts)
     
-    await message.answer(
+    await answer_with_keyboard(
+        message,
         text,
-        parse_mode="HTML",
-        reply_markup=get_main_keyboard()
+        state=state,
+        keyboard="main"
     )
     
-    logger.info(f"Пользователь {user_id} просмотрел историю ({len(history)} документов)")
+    logger.debug("Пользователь %s просмотрел историю (%s документов)", user_id, len(history))
 
 
-@router.message(F.text == "⭐ Избранное")
-async def show_favorites(message: Message, user_storage: UserStorage):
+async def show_favorites(message: Message, user_storage: UserStorage, state: FSMContext):
     """Показать избранные документы"""
     user_id = message.from_user.id
-    favorites = user_storage.get_favorites(user_id)
+    favorites = await user_storage.get_favorites(user_id)
     
     if not favorites:
-        await message.answer(
-            "⭐ <b>Избранные документы</b>\n\n"
-            "У вас пока нет избранных документов.\n\n"
-            "После создания документа нажмите \"⭐ В избранное\", "
-            "чтобы сохранить его в этом разделе.",
-            parse_mode="HTML",
-            reply_markup=get_main_keyboard()
+        await answer_with_keyboard(
+            message,
+            _EMPTY_FAVORITES_TEXT,
+            state=state,
+            keyboard="main"
         )
         return
     
-    text = "⭐ <b>Ваши избранные документы</b>\n\n"
-    for i, doc in enumerate(favorites, 1):
-        template = doc.get('template_name', 'Документ')
-        date = doc.get('date', 'Неизвестно')
-        
-        text += f"{i}. <b>{template}</b>\n"
-        text += f"   📅 {date}\n\n"
-    
-    text += "💡 Нажмите на документ, чтобы скачать его снова"
+    parts = ["⭐ <b>Ваши избранные документы</b>\n\n"]
+    parts.extend(
+        f"{i}. <b>{doc.get('template_name', 'Документ')}</b>\n"
+        f"   📅 {doc.get('date', 'Неизвестно')}\n\n"
+        for i, doc in enumerate(favorites, 1)
+    )
+    parts.append("💡 Нажмите на документ, чтобы скачать его снова")
+    text = "".join(parts)
     
-    await message.answer(
+    await answer_with_keyboard(
+        message,
         text,
-        parse_mode="HTML",
-        reply_markup=get_main_keyboard()
+        state=state,
+        keyboard="main"
     )
     
-    logger.info(f"Пользователь {user_id} просмотрел избранное ({len(favorites)} документов)")
+    logger.debug("Пользователь %s просмотрел избранное (%s документов)", user_id, len(favorites))
 
 
-@router.message(F.text == "📊 Статистика")
-async def show_statistics(message: Message, user_storage: UserStorage):
+async def show_statistics(message: Message, user_storage: UserStorage, state: FSMContext):
     """Показать статистику использования"""
     user_id = message.from_user.id
-    stats = user_storage.get_statistics(user_id)
+    stats = await user_storage.get_statistics(user_id)
     
     total_docs = stats.get('total_documents', 0)
     total_edits = stats.get('total_edits', 0)
@@ -109,62 +165,64 @@ async def show_statistics(message: Message, user_storage: UserStorage):
     total_words = stats.get('total_words', 0)
     last_used = stats.get('last_used', 'Никогда')
     
-    text = (
+    parts = [
         "📊 <b>Ваша статистика</b>\n\n"
         f"📝 Всего документов: <b>{total_docs}</b>\n"
         f"✏️ Редактирований: <b>{total_edits}</b>\n"
         f"⭐ Любимый шаблон: <b>{favorite_template}</b>\n"
         f"📖 Слов написано: <b>{total_words:,}</b>\n"
         f"🕒 Последнее использование: <b>{last_used}</b>\n\n"
-    )
+    ]
     
     if total_docs > 0:
-        text += "🎉 <b>Достижения:</b>\n"
-        if total_docs >= 10:
-            text += "🏆 Создано 10+ документов\n"
-        if total_docs >= 50:
-            text += "🏆 Создано 50+ документов\n"
-        if total_edits >= 20:
-            text += "✨ Мастер редактирования\n"
-        if total_words >= 10000:
-            text += "📚 Написано 10,000+ слов\n"
+        parts.append("🎉 <b>Достижения:</b>\n")
+        parts.extend(msg for achieved, msg in _ACHIEVEMENTS if achieved(stats))
     else:
-        text += "💡 Создайте свой первый документ, чтобы начать собирать статистику!"
+        parts.append("💡 Создайте свой первый документ, чтобы начать собирать статистику!")
     
-    await message.answer(
+    text = "".join(parts)
+    
+    await answer_with_keyboard(
+        message,
         text,
-        parse_mode="HTML",
-        reply_markup=get_main_keyboard()
+        state=state,
+        keyboard="main"
     )
     
-    logger.info(f"Пользователь {user_id} просмотрел статистику")
+    logger.debug("Пользователь %s просмотрел статистику", user_id)
 
 
-@router.message(F.text == "⚙️ Настройки")
-async def show_settings(message: Message, user_storage: UserStorage):
+async def show_settings(message: Message, user_storage: UserStorage, state: FSMContext):
     """Показать настройки пользователя"""
     user_id = message.from_user.id
-    settings = user_storage.get_settings(user_id)
-    
-    language = Config.DOCUMENT_LANGUAGES.get(settings.get('language', 'ru'), '🇷🇺 Русский')
-    style = Config.DOCUMENT_STYLES.get(settings.get('style', 'formal'), '🎩 Официальный')
-    notifications = "✅ Включены" if settings.get('notifications', True) else "❌ Выключены"
-    
-    text = (
-        "⚙️ <b>Настройки</b>\n\n"
-        f"🌍 Язык документа: <b>{language}</b>\n"
-        f"🎨 Стиль документа: <b>{style}</b>\n"
-        f"🔔 Уведомления: <b>{notifications}</b>\n\n"
-        "Выберите, что хотите изменить:"
-    )
+    settings = await user_storage.get_settings(user_id)
+    
+    text = _render_settings(settings)
+    # Текст переиспользуется кнопкой "Назад" до следующего изменения настроек
+    await state.update_data(settings_text=text)
     
     await message.answer(
         text,
-        parse_mode="HTML",
         reply_markup=get_settings_keyboard()
     )
     
-    logger.info(f"Пользователь {user_id} открыл настройки")
+    logger.debug("Пользователь %s открыл настройки", user_id)
+
+
+# Кнопки главного меню: один фильтр с проверкой по множеству вместо
+# отдельного F.text == ... на каждую кнопку
+_MENU = {
+    "📚 История": show_history,
+    "⭐ Избранное": show_favorites,
+    "📊 Статистика": show_statistics,
+    "⚙️ Настройки": show_settings,
+}
+
+
+@router.message(F.text.in_(frozenset(_MENU)))
+async def menu_router(message: Message, state: FSMContext, user_storage: UserStorage):
+    """Маршрутизация нажатий кнопок главного меню"""
+    await _MENU[message.text](message, user_storage, state)
 
 
 @router.callback_query(F.data == "settings_language")
@@ -174,37 +232,29 @@ async def settings_language(callback: CallbackQuery):
         callback.message,
         "🌍 <b>Выберите язык для генерации документов:</b>\n\n"
         "Документы будут создаваться на выбранном языке.",
-        parse_mode="HTML",
-        reply_markup=get_language_keyboard(),
-        send_new_on_fail=True
+        reply_markup=get_language_keyboard()
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("lang_"))
-async def language_selected(callback: CallbackQuery, user_storage: UserStorage):
+@router.callback_query(F.data.in_(_LANG_CALLBACKS))
+async def language_selected(callback: CallbackQuery, state: FSMContext, user_storage: UserStorage):
     """Обработка выбора языка"""
-    language = callback.data.split("_")[1]
+    language = callback.data[len(_LANG_PREFIX):]
     user_id = callback.from_user.id
     
-    user_storage.update_setting(user_id, 'language', language)
+    await user_storage.update_setting(user_id, 'language', language)
+    await state.update_data(settings_text=None)
     
-    lang_name = Config.DOCUMENT_LANGUAGES.get(language, 'Неизвестный')
+    lang_name = _LANGS.get(language, 'Неизвестный')
     
     await safe_edit_message(
         callback.message,
-        f"✅ Язык документов изменён на <b>{lang_name}</b>",
-        parse_mode="HTML",
-        send_new_on_fail=True
-    )
-    
-    await callback.message.answer(
-        "Настройки сохранены!",
-        reply_markup=get_main_keyboard()
+        f"✅ Язык документов изменён на <b>{lang_name}</b>\n\nНастройки сохранены."
     )
     
     await callback.answer()
-    logger.info(f"Пользователь {user_id} изменил язык на {language}")
+    logger.debug("Пользователь %s изменил язык на %s", user_id, language)
 
 
 @router.callback_query(F.data == "settings_style")
@@ -214,67 +264,54 @@ async def settings_style(callback: CallbackQuery):
         callback.message,
         "🎨 <b>Выберите стиль для генерации документов:</b>\n\n"
         "Стиль влияет на тон и формальность текста.",
-        parse_mode="HTML",
-        reply_markup=get_style_keyboard(),
-        send_new_on_fail=True
+        reply_markup=get_style_keyboard()
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("style_"))
-async def style_selected(callback: CallbackQuery, user_storage: UserStorage):
+@router.callback_query(F.data.in_(_STYLE_CALLBACKS))
+async def style_selected(callback: CallbackQuery, state: FSMContext, user_storage: UserStorage):
     """Обработка выбора стиля"""
-    style = callback.data.split("_")[1]
+    style = callback.data[len(_STYLE_PREFIX):]
     user_id = callback.from_user.id
     
-    user_storage.update_setting(user_id, 'style', style)
+    await user_storage.update_setting(user_id, 'style', style)
+    await state.update_data(settings_text=None)
     
-    style_name = Config.DOCUMENT_STYLES.get(style, 'Неизвестный')
+    style_name = _STYLES.get(style, 'Неизвестный')
     
     await safe_edit_message(
         callback.message,
-        f"✅ Стиль документов изменён на <b>{style_name}</b>",
-        parse_mode="HTML",
-        send_new_on_fail=True
-    )
-    
-    await callback.message.answer(
-        "Настройки сохранены!",
-        reply_markup=get_main_keyboard()
+        f"✅ Стиль документов изменён на <b>{style_name}</b>\n\nНастройки сохранены."
     )
     
     await callback.answer()
-    logger.info(f"Пользователь {user_id} изменил стиль на {style}")
+    logger.debug("Пользователь %s изменил стиль на %s", user_id, style)
 
 
 @router.callback_query(F.data == "settings_notifications")
-async def settings_notifications(callback: CallbackQuery, user_storage: UserStorage):
+async def settings_notifications(callback: CallbackQuery, state: FSMContext,
+                                 user_storage: UserStorage):
     """Переключение уведомлений"""
     user_id = callback.from_user.id
-    settings = user_storage.get_settings(user_id)
+    settings = await user_storage.get_settings(user_id)
     
     current = settings.get('notifications', True)
     new_value = not current
     
-    user_storage.update_setting(user_id, 'notifications', new_value)
+    await user_storage.update_setting(user_id, 'notifications', new_value)
+    await state.update_data(settings_text=None)
     
     status = "включены" if new_value else "выключены"
     emoji = "✅" if new_value else "❌"
     
     await safe_edit_message(
         callback.message,
-        f"{emoji} Уведомления <b>{status}</b>",
-        parse_mode="HTML",
-        send_new_on_fail=True
-    )
-    
-    await callback.message.answer(
-        "Настройки сохранены!",
-        reply_markup=get_main_keyboard()
+        f"{emoji} Уведомления <b>{status}</b>\n\nНастройки сохранены."
     )
     
     await callback.answer()
-    logger.info(f"Пользователь {user_id} изменил уведомления на {new_value}")
+    logger.debug("Пользователь %s изменил уведомления на %s", user_id, new_value)
 
 
 @router.callback_query(F.data == "settings_clear_history")
@@ -282,49 +319,33 @@ async def settings_clear_history(callback: CallbackQuery, user_storage: UserStor
     """Очистка истории"""
     user_id = callback.from_user.id
     
-    count = user_storage.clear_history(user_id)
+    count = await user_storage.clear_history(user_id)
     
     await safe_edit_message(
         callback.message,
         f"🗑️ История очищена!\n\n"
-        f"Удалено записей: <b>{count}</b>",
-        parse_mode="HTML",
-        send_new_on_fail=True
-    )
-    
-    await callback.message.answer(
-        "История документов очищена.",
-        reply_markup=get_main_keyboard()
+        f"Удалено записей: <b>{count}</b>"
     )
     
     await callback.answer()
-    logger.info(f"Пользователь {user_id} очистил историю ({count} записей)")
+    logger.debug("Пользователь %s очистил историю (%s записей)", user_id, count)
 
 
 @router.callback_query(F.data == "settings_back")
-async def settings_back(callback: CallbackQuery, user_storage: UserStorage):
+async def settings_back(callback: CallbackQuery, state: FSMContext, user_storage: UserStorage):
     """Вернуться к меню настроек"""
-    user_id = callback.from_user.id
-    settings = user_storage.get_settings(user_id)
-    
-    language = Config.DOCUMENT_LANGUAGES.get(settings.get('language', 'ru'), '🇷🇺 Русский')
-    style = Config.DOCUMENT_STYLES.get(settings.get('style', 'formal'), '🎩 Официальный')
-    notifications = "✅ Включены" if settings.get('notifications', True) else "❌ Выключены"
-    
-    text = (
-        "⚙️ <b>Настройки</b>\n\n"
-        f"🌍 Язык документа: <b>{language}</b>\n"
-        f"🎨 Стиль документа: <b>{style}</b>\n"
-        f"🔔 Уведомления: <b>{notifications}</b>\n\n"
-        "Выберите, что хотите изменить:"
-    )
+    data = await state.get_data()
+    text = data.get('settings_text')
+    
+    if text is None:
+        settings = await user_storage.get_settings(callback.from_user.id)
+        text = _render_settings(settings)
+        await state.update_data(settings_text=text)
     
     await safe_edit_message(
         callback.message,
         text,
-        parse_mode="HTML",
-        reply_markup=get_settings_keyboard(),
-        send_new_on_fail=True
+        reply_markup=get_settings_keyboard()
     )
     
     await callback.answer()
@@ -346,13 +367,13 @@ async def action_favorite(callback: CallbackQuery, state: FSMContext, user_stora
         'template_type': data.get('last_template_type', 'custom'),
         'doc_type': data.get('last_doc_type', 'docx'),
         'user_request': data.get('last_user_request', ''),
-        'date': datetime.now().strftime("%Y-%m-%d %H:%M")
+        'date': _current_minute()
     }
     
-    user_storage.add_favorite(user_id, doc_data)
+    await user_storage.add_favorite(user_id, doc_data)
     
     await callback.answer("⭐ Документ добавлен в избранное!", show_alert=True)
-    logger.info(f"Пользователь {user_id} добавил документ в избранное")
+    logger.debug("Пользователь %s добавил документ в избранное", user_id)
 
 
 @router.callback_query(F.data == "action_preview")
@@ -370,9 +391,8 @@ async def action_preview(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer(
         f"👁️ <b>Предпросмотр документа:</b>\n\n"
         f"<pre>{preview}</pre>\n\n"
-        f"📊 Длина: {len(content)} символов",
-        parse_mode="HTML"
+        f"📊 Длина: {len(content)} символов"
     )
     
     await callback.answer()
-    logger.info(f"Пользователь {callback.from_user.id} запросил предпросмотр")
+    logger.debug("Пользователь %s запросил предпросмотр", callback.from_user.id)
@@ -11,19 +11,74 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from telegram_doc_bot.utils.keyboards import (
-    get_main_keyboard,
-    get_cancel_keyboard,
     get_api_key_management_keyboard,
     get_api_key_confirm_keyboard
 )
 from telegram_doc_bot.utils.user_storage import UserStorage
-from telegram_doc_bot.utils.message_helpers import safe_edit_message
+from telegram_doc_bot.utils.message_helpers import safe_edit_message, answer_with_keyboard
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
-user_storage = UserStorage()
+# Формат API ключа Google: "AIza" + 35 символов
+_API_KEY_LENGTH = 39
+_API_KEY_RE = re.compile(r'^AIza[0-9A-Za-z_-]{35}\Z')
+
+# Статические тексты сообщений
+_STATUS_TEXT_ACTIVE = (
+    "🔑 <b>Ваш API ключ Gemini</b>\n\n"
+    "✅ <b>Статус:</b> Активен\n\n"
+    "📌 Ваш API ключ сохранён и используется для генерации документов.\n\n"
+    "💡 Вы можете обновить или удалить ключ, используя кнопки ниже."
+)
+
+_STATUS_TEXT_MISSING = (
+    "🔑 <b>API ключ Gemini</b>\n\n"
+    "❌ <b>Статус:</b> Не настроен\n\n"
+    "📌 Для работы бота необходим API ключ Google Gemini.\n\n"
+    "🎯 <b>Почему это нужно?</b>\n"
+    "• Ключ используется для генерации контента документов\n"
+    "• Ваш ключ хранится безопасно и используется только вами\n"
+    "• Это бесплатный сервис от Google (в пределах лимитов)\n\n"
+    "👇 Нажмите кнопку ниже, чтобы добавить ключ"
+)
+
+_HELP_TEXT = (
+    "🔑 <b>Как получить API ключ Gemini?</b>\n\n"
+    
+    "📝 <b>Пошаговая инструкция:</b>\n\n"
+    
+    "1️⃣ Перейдите на сайт Google AI Studio:\n"
+    "🔗 <code>https://aistudio.google.com/app/apikey</code>\n\n"
+    
+    "2️⃣ Войдите в свой Google аккаунт\n\n"
+    
+    "3️⃣ Нажмите кнопку <b>\"Create API key\"</b> или <b>\"Get API key\"</b>\n\n"
+    
+    "4️⃣ Выберите проект или создайте новый\n\n"
+    
+    "5️⃣ Скопируйте полученный ключ (начинается с AIza...)\n\n"
+    
+    "6️⃣ Вернитесь в бот и отправьте ключ\n\n"
+    
+    "💡 <b>Важная информация:</b>\n"
+    "• API ключ предоставляется бесплатно\n"
+    "• Есть лимиты запросов (достаточно для большинства пользователей)\n"
+    "• Ключ привязан к вашему Google аккаунту\n"
+    "• Не делитесь ключом с другими людьми\n\n"
+    
+    "❓ Если возникли проблемы, проверьте документацию Google AI Studio"
+)
+
+_DELETE_CONFIRM_TEXT = (
+    "🗑 <b>Удаление API ключа</b>\n\n"
+    "⚠️ Вы уверены, что хотите удалить ваш API ключ?\n\n"
+    "После удаления:\n"
+    "• Вы не сможете создавать документы\n"
+    "• Вам потребуется добавить ключ заново\n\n"
+    "Подтвердите удаление:"
+)
 
 
 class APIKeySetup(StatesGroup):
@@ -33,42 +88,23 @@ class APIKeySetup(StatesGroup):
 
 @router.message(F.text == "🔑 Мой API ключ")
 @router.message(Command("apikey"))
-async def show_api_key_status(message: Message):
+async def show_api_key_status(message: Message, user_storage: UserStorage):
     """
     Показать статус API ключа пользователя
     
     Args:
         message: Сообщение пользователя
+        user_storage: Хранилище пользовательских данных
     """
     user_id = message.from_user.id
-    has_key = user_storage.has_api_key(user_id)
-    
-    if has_key:
-        status_text = (
-            "🔑 <b>Ваш API ключ Gemini</b>\n\n"
-            "✅ <b>Статус:</b> Активен\n\n"
-            "📌 Ваш API ключ сохранён и используется для генерации документов.\n\n"
-            "💡 Вы можете обновить или удалить ключ, используя кнопки ниже."
-        )
-    else:
-        status_text = (
-            "🔑 <b>API ключ Gemini</b>\n\n"
-            "❌ <b>Статус:</b> Не настроен\n\n"
-            "📌 Для работы бота необходим API ключ Google Gemini.\n\n"
-            "🎯 <b>Почему это нужно?</b>\n"
-            "• Ключ используется для генерации контента документов\n"
-            "• Ваш ключ хранится безопасно и используется только вами\n"
-            "• Это бесплатный сервис от Google (в пределах лимитов)\n\n"
-            "👇 Нажмите кнопку ниже, чтобы добавить ключ"
-        )
+    has_key = await user_storage.has_api_key(user_id)
     
     await message.answer(
-        status_text,
-        parse_mode="HTML",
+        _STATUS_TEXT_ACTIVE if has_key else _STATUS_TEXT_MISSING,
         reply_markup=get_api_key_management_keyboard(has_key=has_key)
     )
     
-    logger.info(f"Пользователь {user_id} просмотрел статус API ключа")
+    logger.debug("Пользователь %s просмотрел статус API ключа", user_id)
 
 
 @router.callback_query(F.data == "apikey_add")
@@ -93,15 +129,13 @@ async def start_api_key_setup(callback: CallbackQuery, state: FSMContext):
         f"• Будьте внимательны при вводе\n"
         f"• Ключ будет сохранён в защищённом хранилище\n"
         f"• Никто кроме вас не сможет использовать ваш ключ\n\n"
-        f"❌ Используйте /cancel для отмены",
-        parse_mode="HTML",
-        send_new_on_fail=True
+        f"❌ Используйте /cancel для отмены"
     )
     
     await state.set_state(APIKeySetup.entering_key)
     await callback.answer()
     
-    logger.info(f"Пользователь {callback.from_user.id} начал {action} API ключ")
+    logger.debug("Пользователь %s начал %s API ключ", callback.from_user.id, action)
 
 
 @router.callback_query(F.data == "apikey_help")
@@ -112,39 +146,11 @@ async def show_api_key_help(callback: CallbackQuery):
     Args:
         callback: Callback запрос
     """
-    help_text = (
-        "🔑 <b>Как получить API ключ Gemini?</b>\n\n"
-        
-        "📝 <b>Пошаговая инструкция:</b>\n\n"
-        
-        "1️⃣ Перейдите на сайт Google AI Studio:\n"
-        "🔗 <code>https://aistudio.google.com/app/apikey</code>\n\n"
-        
-        "2️⃣ Войдите в свой Google аккаунт\n\n"
-        
-        "3️⃣ Нажмите кнопку <b>\"Create API key\"</b> или <b>\"Get API key\"</b>\n\n"
-        
-        "4️⃣ Выберите проект или создайте новый\n\n"
-        
-        "5️⃣ Скопируйте полученный ключ (начинается с AIza...)\n\n"
-        
-        "6️⃣ Вернитесь в бот и отправьте ключ\n\n"
-        
-        "💡 <b>Важная информация:</b>\n"
-        "• API ключ предоставляется бесплатно\n"
-        "• Есть лимиты запросов (достаточно для большинства пользователей)\n"
-        "• Ключ привязан к вашему Google аккаунту\n"
-        "• Не делитесь ключом с другими людьми\n\n"
-        
-        "❓ Если возникли проблемы, проверьте документацию Google AI Studio"
-    )
     
     await safe_edit_message(
         callback.message,
-        help_text,
-        parse_mode="HTML",
-        reply_markup=get_api_key_management_keyboard(has_key=False),
-        send_new_on_fail=True
+        _HELP_TEXT,
+        reply_markup=get_api_key_management_keyboard(has_key=False)
     )
     
     await callback.answer()
@@ -161,22 +167,25 @@ async def cancel_api_key_setup(message: Message, state: FSMContext):
     """
     await state.clear()
     
-    await message.answer(
+    await answer_with_keyboard(
+        message,
         "❌ Настройка API ключа отменена.",
-        reply_markup=get_main_keyboard()
+        state=state,
+        keyboard="main"
     )
     
-    logger.info(f"Пользователь {message.from_user.id} отменил настройку API ключа")
+    logger.debug("Пользователь %s отменил настройку API ключа", message.from_user.id)
 
 
 @router.message(APIKeySetup.entering_key, F.text)
-async def process_api_key(message: Message, state: FSMContext):
+async def process_api_key(message: Message, state: FSMContext, user_storage: UserStorage):
     """
     Обработка введённого API ключа
     
     Args:
         message: Сообщение с API ключом
         state: Состояние FSM
+        user_storage: Хранилище пользовательских данных
     """
     api_key = message.text.strip()
     user_id = message.from_user.id
@@ -187,7 +196,7 @@ async def process_api_key(message: Message, state: FSMContext):
         )
         return
     
-    if not re.match(r'^AIza[0-9A-Za-z_-]{35}$', api_key):
+    if len(api_key) != _API_KEY_LENGTH or _API_KEY_RE.match(api_key) is None:
         await message.answer(
             "❌ <b>Неверный формат API ключа</b>\n\n"
             "API ключ Google Gemini должен:\n"
@@ -195,8 +204,7 @@ async def process_api_key(message: Message, state: FSMContext):
             "• Содержать 39 символов\n"
             "• Состоять из букв, цифр, дефисов и подчёркиваний\n\n"
             "Пожалуйста, проверьте ключ и попробуйте снова.\n"
-            "Или используйте /cancel для отмены.",
-            parse_mode="HTML"
+            "Или используйте /cancel для отмены."
         )
         return
     
@@ -205,7 +213,7 @@ async def process_api_key(message: Message, state: FSMContext):
     except Exception:
         pass
     
-    if user_storage.set_api_key(user_id, api_key):
+    if await user_storage.set_api_key(user_id, api_key):
         success_text = (
             "✅ <b>API ключ успешно сохранён!</b>\n\n"
             "🎉 Теперь вы можете создавать документы.\n\n"
@@ -213,24 +221,26 @@ async def process_api_key(message: Message, state: FSMContext):
             "🔒 Ваш ключ надёжно сохранён и будет использоваться только для ваших запросов."
         )
         
-        await message.answer(
+        await state.clear()
+        await answer_with_keyboard(
+            message,
             success_text,
-            parse_mode="HTML",
-            reply_markup=get_main_keyboard()
+            state=state,
+            keyboard="main"
         )
         
-        await state.clear()
-        logger.info(f"API ключ успешно сохранён для пользователя {user_id}")
+        logger.info("API ключ успешно сохранён для пользователя %s", user_id)
     else:
-        await message.answer(
+        await state.clear()
+        await answer_with_keyboard(
+            message,
             "❌ <b>Ошибка при сохранении ключа</b>\n\n"
             "Произошла ошибка при сохранении API ключа. "
             "Пожалуйста, попробуйте ещё раз позже или обратитесь в поддержку.",
-            parse_mode="HTML",
-            reply_markup=get_main_keyboard()
+            state=state,
+            keyboard="main"
         )
-        await state.clear()
-        logger.error(f"Не удалось сохранить API ключ для пользователя {user_id}")
+        logger.error("Не удалось сохранить API ключ для пользователя %s", user_id)
 
 
 @router.callback_query(F.data == "apikey_delete")
@@ -243,70 +253,63 @@ async def confirm_api_key_deletion(callback: CallbackQuery):
     """
     await safe_edit_message(
         callback.message,
-        "🗑 <b>Удаление API ключа</b>\n\n"
-        "⚠️ Вы уверены, что хотите удалить ваш API ключ?\n\n"
-        "После удаления:\n"
-        "• Вы не сможете создавать документы\n"
-        "• Вам потребуется добавить ключ заново\n\n"
-        "Подтвердите удаление:",
-        parse_mode="HTML",
-        reply_markup=get_api_key_confirm_keyboard(),
-        send_new_on_fail=True
+        _DELETE_CONFIRM_TEXT,
+        reply_markup=get_api_key_confirm_keyboard()
     )
     
     await callback.answer()
 
 
 @router.callback_query(F.data == "apikey_delete_confirm")
-async def delete_api_key(callback: CallbackQuery):
+async def delete_api_key(callback: CallbackQuery, state: FSMContext, user_storage: UserStorage):
     """
     Удаление API ключа пользователя
     
     Args:
         callback: Callback запрос
+        state: Состояние FSM
+        user_storage: Хранилище пользовательских данных
     """
     user_id = callback.from_user.id
     
-    if user_storage.delete_api_key(user_id):
+    if await user_storage.delete_api_key(user_id):
+        # Сбрасываем копию ключа, сохранённую в FSM сценарием создания документа
+        await state.update_data(api_key=None)
+        
         await safe_edit_message(
             callback.message,
             "✅ <b>API ключ удалён</b>\n\n"
             "Ваш API ключ был успешно удалён из системы.\n\n"
             "Чтобы снова использовать бот, добавьте новый ключ через:\n"
-            "🔑 Мой API ключ",
-            parse_mode="HTML",
-            send_new_on_fail=True
+            "🔑 Мой API ключ"
         )
         
-        logger.info(f"API ключ удалён для пользователя {user_id}")
+        logger.info("API ключ удалён для пользователя %s", user_id)
     else:
         await safe_edit_message(
             callback.message,
             "❌ <b>Ошибка при удалении</b>\n\n"
-            "Не удалось удалить API ключ. Попробуйте позже.",
-            parse_mode="HTML",
-            send_new_on_fail=True
+            "Не удалось удалить API ключ. Попробуйте позже."
         )
         
-        logger.error(f"Не удалось удалить API ключ для пользователя {user_id}")
+        logger.error("Не удалось удалить API ключ для пользователя %s", user_id)
     
     await callback.answer()
 
 
 @router.callback_query(F.data == "apikey_delete_cancel")
-async def cancel_api_key_deletion(callback: CallbackQuery):
+async def cancel_api_key_deletion(callback: CallbackQuery, user_storage: UserStorage):
     """
     Отмена удаления API ключа
     
     Args:
         callback: Callback запрос
+        user_storage: Хранилище пользовательских данных
     """
     await safe_edit_message(
         callback.message,
-        "✅ Удаление отменено. Ваш API ключ сохранён.",
-        parse_mode="HTML",
-        send_new_on_fail=True
+        "✅ Удаление отменено. Ваш API ключ сохранён."
     )
     
-    await show_api_key_status(callback.message)
+    await show_api_key_status(callback.message, user_storage)
     await callback.answer()
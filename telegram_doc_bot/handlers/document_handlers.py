@@ -3,24 +3,29 @@
 Использует FSM (Finite State Machine) для управления процессом создания документа.
 """
 
+import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
 from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.types import Message, CallbackQuery, BufferedInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
 from telegram_doc_bot.services import GeminiService, DocumentService
 from telegram_doc_bot.utils.keyboards import (
-    get_main_keyboard,
     get_template_keyboard,
     get_document_type_keyboard,
-    get_cancel_keyboard,
     get_document_actions_keyboard,
     get_api_key_management_keyboard
 )
 from telegram_doc_bot.utils.user_storage import UserStorage
-from telegram_doc_bot.utils.message_helpers import safe_edit_message, safe_delete_message
+from telegram_doc_bot.utils.message_helpers import (
+    safe_edit_message,
+    safe_delete_message,
+    answer_with_keyboard
+)
 from telegram_doc_bot.config import Config
 
 logger = logging.getLogger(__name__)
@@ -28,6 +33,111 @@ logger = logging.getLogger(__name__)
 # Создание роутера для обработчиков документов
 router = Router()
 
+# Локальные ссылки на справочники Config для горячих обработчиков
+_DOC_TEMPLATES = Config.DOCUMENT_TEMPLATES
+_DOC_TYPES = Config.DOCUMENT_TYPES
+_MAX_LEN = Config.MAX_REQUEST_LENGTH
+
+# Статические тексты сообщений
+_API_KEY_MISSING_TEXT = (
+    "🔑 <b>API ключ не настроен</b>\n\n"
+    "❗ Для создания документов необходим API ключ Google Gemini.\n\n"
+    "🎯 <b>Что нужно сделать:</b>\n"
+    "1. Нажмите кнопку \"🔑 Мой API ключ\"\n"
+    "2. Следуйте инструкциям для получения ключа\n"
+    "3. Добавьте ключ в бот\n"
+    "4. Начните создавать документы!\n\n"
+    "💡 Это займёт всего пару минут, и API предоставляется бесплатно."
+)
+
+_REQUEST_PROMPT_TEXT = (
+    "📝 Теперь опишите, какой документ вам нужен.\n\n"
+    "Укажите все важные детали:\n"
+    "• Для договора: стороны, предмет, условия\n"
+    "• Для заявления: кому, от кого, суть просьбы\n"
+    "• Для резюме: ФИО, опыт, навыки, образование\n"
+    "• Для письма: адресат, тема, основное содержание\n\n"
+    f"Максимальная длина: {_MAX_LEN} символов"
+)
+
+_UNKNOWN_COMMAND_TEXT = (
+    "⚠️ Команда не распознана.\n"
+    "Опишите документ обычным текстом или нажмите \"❌ Отмена\"."
+)
+
+_API_KEY_NOT_FOUND_GENERATE_TEXT = (
+    "❌ <b>API ключ не найден</b>\n\n"
+    "Пожалуйста, добавьте API ключ перед созданием документов."
+)
+
+_GENERATING_TEXT = (
+    "⏳ Генерирую документ...\n"
+    "Это может занять 10-30 секунд. Пожалуйста, подождите."
+)
+
+_GENERATION_FAILED_TEXT = (
+    "❌ Ошибка при генерации контента.\n"
+    "Пожалуйста, попробуйте ещё раз или измените запрос."
+)
+
+_SENDING_TEXT = "📤 Отправляю документ..."
+
+_GENERATION_ERROR_TEXT = (
+    "❌ Произошла ошибка при создании документа.\n"
+    "Пожалуйста, попробуйте ещё раз позже."
+)
+
+_EDIT_INSTRUCTIONS_TEXT = (
+    "✏️ <b>Редактирование документа</b>\n\n"
+    "Опишите, какие изменения нужно внести в документ.\n\n"
+    "Примеры инструкций:\n"
+    "• 'Добавь раздел о гарантиях'\n"
+    "• 'Сделай текст короче и лаконичнее'\n"
+    "• 'Измени тон на более формальный'\n"
+    "• 'Добавь больше деталей о...'\n"
+    "• 'Убери раздел о...'"
+)
+
+_API_KEY_NOT_FOUND_EDIT_TEXT = (
+    "❌ <b>API ключ не найден</b>\n\n"
+    "Пожалуйста, добавьте API ключ перед редактированием документов."
+)
+
+_EDITING_TEXT = (
+    "✏️ Применяю изменения к документу...\n"
+    "Это может занять 10-30 секунд."
+)
+
+_SENDING_UPDATED_TEXT = "📤 Отправляю обновлённый документ..."
+
+
+# Кэш экземпляров GeminiService по хэшу API ключа (LRU)
+_GEMINI_CACHE_SIZE = 256
+_gemini_cache: "OrderedDict[bytes, GeminiService]" = OrderedDict()
+
+
+def _get_gemini(api_key: str) -> GeminiService:
+    """
+    Получение сервиса Gemini для API ключа с переиспользованием экземпляров
+    
+    Args:
+        api_key: API ключ пользователя
+    
+    Returns:
+        Экземпляр GeminiService, привязанный к ключу
+    """
+    key = hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+    service = _gemini_cache.get(key)
+    if service is not None:
+        _gemini_cache.move_to_end(key)
+        return service
+    
+    service = GeminiService(api_key=api_key)
+    _gemini_cache[key] = service
+    if len(_gemini_cache) > _GEMINI_CACHE_SIZE:
+        _gemini_cache.popitem(last=False)
+    return service
+
 
 class DocumentGeneration(StatesGroup):
     """Состояния для процесса генерации документа"""
@@ -54,24 +164,21 @@ async def start_document_generation(message: Message, state: FSMContext, user_st
         user_storage: Хранилище пользовательских данных
     """
     user_id = message.from_user.id
+    api_key = await user_storage.get_api_key(user_id)
     
-    if not user_storage.has_api_key(user_id):
+    if not api_key:
         await message.answer(
-            "🔑 <b>API ключ не настроен</b>\n\n"
-            "❗ Для создания документов необходим API ключ Google Gemini.\n\n"
-            "🎯 <b>Что нужно сделать:</b>\n"
-            "1. Нажмите кнопку \"🔑 Мой API ключ\"\n"
-            "2. Следуйте инструкциям для получения ключа\n"
-            "3. Добавьте ключ в бот\n"
-            "4. Начните создавать документы!\n\n"
-            "💡 Это займёт всего пару минут, и API предоставляется бесплатно.",
+            _API_KEY_MISSING_TEXT,
             parse_mode="HTML",
             reply_markup=get_api_key_management_keyboard(has_key=False)
         )
-        logger.info(f"Пользователь {user_id} попытался создать документ без API ключа")
+        logger.info("Пользователь %s попытался создать документ без API ключа", user_id)
         return
     
-    await state.clear()
+    # Ключ читается из хранилища один раз за сценарий и дальше берётся из FSM.
+    # set_data целиком заменяет данные прошлого сценария, а состояние
+    # перезаписывается ниже, поэтому отдельный clear() не нужен
+    await state.set_data({'api_key': api_key})
     
     await message.answer(
         "📝 <b>Создание документа</b>\n\n"
@@ -81,7 +188,7 @@ async def start_document_generation(message: Message, state: FSMContext, user_st
     )
     
     await state.set_state(DocumentGeneration.choosing_template)
-    logger.info(f"Пользователь {message.from_user.id} начал создание документа")
+    logger.info("Пользователь %s начал создание документа", message.from_user.id)
 
 
 @router.callback_query(DocumentGeneration.choosing_template, F.data.startswith("template_"))
@@ -93,33 +200,33 @@ async def template_chosen(callback: CallbackQuery, state: FSMContext):
         callback: Callback запрос
         state: Состояние FSM
     """
-    template_type = callback.data.split("_")[1]
-    template_name = Config.DOCUMENT_TEMPLATES.get(template_type, "Произвольный документ")
+    _, _, template_type = callback.data.partition("_")
+    template_name = _DOC_TEMPLATES.get(template_type, "Произвольный документ")
     
     # Сохранение выбранного шаблона в состояние
     await state.update_data(template_type=template_type, template_name=template_name)
     
-    await safe_edit_message(
-        callback.message,
-        f"✅ Выбран шаблон: <b>{template_name}</b>",
-        parse_mode="HTML"
-    )
-    
-    await callback.message.answer(
-        "📝 Теперь опишите, какой документ вам нужен.\n\n"
-        "Укажите все важные детали:\n"
-        "• Для договора: стороны, предмет, условия\n"
-        "• Для заявления: кому, от кого, суть просьбы\n"
-        "• Для резюме: ФИО, опыт, навыки, образование\n"
-        "• Для письма: адресат, тема, основное содержание\n\n"
-        f"Максимальная длина: {Config.MAX_REQUEST_LENGTH} символов",
-        reply_markup=get_cancel_keyboard()
+    # Reply-клавиатуру нельзя прикрепить к редактируемому сообщению, поэтому
+    # правка inline-сообщения и новая подсказка отправляются параллельно
+    await asyncio.gather(
+        safe_edit_message(
+            callback.message,
+            f"✅ Выбран шаблон: <b>{template_name}</b>",
+            parse_mode="HTML",
+            send_new_on_fail=False
+        ),
+        answer_with_keyboard(
+            callback.message,
+            _REQUEST_PROMPT_TEXT,
+            state=state,
+            keyboard="cancel"
+        )
     )
     
     await state.set_state(DocumentGeneration.entering_request)
     await callback.answer()
     
-    logger.info(f"Пользователь {callback.from_user.id} выбрал шаблон: {template_name}")
+    logger.info("Пользователь %s выбрал шаблон: %s", callback.from_user.id, template_name)
 
 
 @router.message(DocumentGeneration.entering_request, F.text == "❌ Отмена")
@@ -134,12 +241,34 @@ async def cancel_generation(message: Message, state: FSMContext):
     """
     await state.clear()
     
-    await message.answer(
+    await answer_with_keyboard(
+        message,
         "❌ Создание документа отменено.",
-        reply_markup=get_main_keyboard()
+        state=state,
+        keyboard="main"
     )
     
-    logger.info(f"Пользователь {message.from_user.id} отменил создание документа")
+    logger.info("Пользователь %s отменил создание документа", message.from_user.id)
+
+
+@router.message(DocumentGeneration.entering_request, F.text.startswith("/"))
+async def command_instead_of_request(message: Message, state: FSMContext):
+    """
+    Команда, введённая вместо описания документа
+    
+    Известные команды (/start, /cancel, /generate и др.) перехватываются
+    раньше; сюда попадают остальные, чтобы они не сохранились как запрос.
+    
+    Args:
+        message: Сообщение пользователя
+        state: Состояние FSM
+    """
+    await answer_with_keyboard(
+        message,
+        _UNKNOWN_COMMAND_TEXT,
+        state=state,
+        keyboard="cancel"
+    )
 
 
 @router.message(DocumentGeneration.entering_request, F.text)
@@ -152,17 +281,20 @@ async def request_entered(message: Message, state: FSMContext):
         state: Состояние FSM
     """
     user_request = message.text
+    if not user_request:
+        return
     
     # Проверка длины запроса
-    if len(user_request) > Config.MAX_REQUEST_LENGTH:
+    req_len = len(user_request)
+    if req_len > _MAX_LEN:
         await message.answer(
-            f"⚠️ Ваш запрос слишком длинный ({len(user_request)} символов).\n"
-            f"Максимальная длина: {Config.MAX_REQUEST_LENGTH} символов.\n\n"
+            f"⚠️ Ваш запрос слишком длинный ({req_len} символов).\n"
+            f"Максимальная длина: {_MAX_LEN} символов.\n\n"
             "Пожалуйста, сократите описание и попробуйте снова."
         )
         return
     
-    if len(user_request) < 10:
+    if req_len < 10:
         await message.answer(
             "⚠️ Описание слишком короткое.\n"
             "Пожалуйста, опишите подробнее, какой документ вам нужен."
@@ -180,7 +312,10 @@ async def request_entered(message: Message, state: FSMContext):
     
     await state.set_state(DocumentGeneration.choosing_doc_type)
     
-    logger.info(f"Пользователь {message.from_user.id} ввёл описание документа: {user_request[:50]}...")
+    logger.info(
+        "Пользователь %s ввёл описание документа: %s...",
+        message.from_user.id, user_request[:50]
+    )
 
 
 @router.callback_query(DocumentGeneration.choosing_doc_type, F.data.startswith("doctype_"))
@@ -196,126 +331,94 @@ async def document_type_chosen(callback: CallbackQuery, state: FSMContext,
         user_storage: Хранилище пользовательских данных
         document_service: Сервис генерации документов
     """
-    doc_type = callback.data.split("_")[1]
+    _, _, doc_type = callback.data.partition("_")
     user_id = callback.from_user.id
     
+    # Получение данных из состояния
+    data = await state.get_data()
+    template_type = data.get('template_type')
+    template_name = data.get('template_name')
+    user_request = data.get('user_request')
+    
     # Проверка наличия API ключа
-    api_key = user_storage.get_api_key(user_id)
+    api_key = data.get('api_key') or await user_storage.get_api_key(user_id)
     if not api_key:
         await safe_edit_message(
             callback.message,
-            "❌ <b>API ключ не найден</b>\n\n"
-            "Пожалуйста, добавьте API ключ перед созданием документов.",
-            parse_mode="HTML",
-            send_new_on_fail=True
+            _API_KEY_NOT_FOUND_GENERATE_TEXT,
+            parse_mode="HTML"
         )
         await state.clear()
         await callback.answer()
         return
     
-    # Инициализация Gemini сервиса с API ключом пользователя
-    gemini_service = GeminiService(api_key=api_key)
-    
-    # Получение данных из состояния
-    data = await state.get_data()
-    template_type = data.get('template_type')
-    template_name = data.get('template_name')
-    user_request = data.get('user_request')
-    
-    await safe_edit_message(
-        callback.message,
-        f"✅ Формат: <b>{Config.DOCUMENT_TYPES[doc_type]}</b>",
-        parse_mode="HTML"
-    )
-    
-    # Отправка сообщения о начале генерации
-    status_message = await callback.message.answer(
-        "⏳ Генерирую документ...\n"
-        "Это может занять 10-30 секунд. Пожалуйста, подождите.",
-        reply_markup=get_main_keyboard()
+    # Gemini сервис с API ключом пользователя
+    gemini_service = _get_gemini(api_key)
+    
+    # Генерация контента запускается сразу и идёт параллельно
+    # с отправкой статусных сообщений в Telegram; документ собирается
+    # по мере поступления текста от нейросети
+    logger.info("Генерация контента для пользователя %s", callback.from_user.id)
+    gen_task = asyncio.create_task(
+        document_service.render_document_stream(
+            gemini_service.stream_document_content(user_request, template_type),
+            doc_type=doc_type,
+            title=template_name,
+            user_id=user_id
+        )
     )
     
     try:
-        # Генерация контента с помощью Gemini
-        logger.info(f"Генерация контента для пользователя {callback.from_user.id}")
-        content = await gemini_service.generate_document_content(user_request, template_type)
-        
-        if not content:
-            await safe_edit_message(
-                status_message,
-                "❌ Ошибка при генерации контента.\n"
-                "Пожалуйста, попробуйте ещё раз или измените запрос.",
-                send_new_on_fail=True
-            )
-            await state.clear()
-            return
-        
-        # Обновление статуса
         await safe_edit_message(
-            status_message,
-            "📄 Контент сгенерирован!\n"
-            "⏳ Создаю документ...",
-            send_new_on_fail=True
+            callback.message,
+            f"✅ Формат: <b>{_DOC_TYPES[doc_type]}</b>",
+            parse_mode="HTML",
+            send_new_on_fail=False
         )
         
-        # Создание документа в выбранном формате
-        if doc_type == 'docx':
-            filepath = await document_service.create_word_document(
-                content=content,
-                title=template_name,
-                user_id=callback.from_user.id
-            )
-        else:  # pdf
-            filepath = await document_service.create_pdf_document(
-                content=content,
-                title=template_name,
-                user_id=callback.from_user.id
-            )
+        # Отправка сообщения о начале генерации
+        status_message = await answer_with_keyboard(
+            callback.message,
+            _GENERATING_TEXT,
+            state=state,
+            keyboard="main",
+            data=data
+        )
+    except Exception:
+        gen_task.cancel()
+        raise
+    
+    try:
+        rendered = await gen_task
         
-        if not filepath:
+        if not rendered:
             await safe_edit_message(
                 status_message,
-                "❌ Ошибка при создании документа.\n"
-                "Пожалуйста, попробуйте ещё раз.",
-                send_new_on_fail=True
+                _GENERATION_FAILED_TEXT
             )
             await state.clear()
             return
         
-        # Обновление статуса
-        await safe_edit_message(
-            status_message,
-            "📤 Отправляю документ...",
-            send_new_on_fail=True
-        )
-        
-        # Отправка документа пользователю
-        document = FSInputFile(filepath)
+        # Отправка документа пользователю вместе с обновлением статуса
+        # Файл собран в памяти: отправляем байты без записи и чтения с диска
+        content, filename, file_bytes = rendered
+        document = BufferedInputFile(file_bytes, filename=filename)
         
-        await callback.message.answer_document(
-            document=document,
-            caption=(
-                f"✅ <b>Документ готов!</b>\n\n"
-                f"📋 Тип: {template_name}\n"
-                f"📄 Формат: {Config.DOCUMENT_TYPES[doc_type]}\n"
-                f"📊 Размер контента: {len(content)} символов"
+        await asyncio.gather(
+            safe_edit_message(
+                status_message,
+                _SENDING_TEXT
             ),
-            parse_mode="HTML"
-        )
-        
-        # Удаление сообщения о статусе
-        await safe_delete_message(status_message)
-        
-        # Очистка временного файла
-        document_service.cleanup_file(filepath)
-        
-        # Сохраняем данные документа для возможного редактирования
-        await state.update_data(
-            last_content=content,
-            last_template_type=template_type,
-            last_template_name=template_name,
-            last_doc_type=doc_type,
-            last_user_request=user_request
+            callback.message.answer_document(
+                document=document,
+                caption=(
+                    f"✅ <b>Документ готов!</b>\n\n"
+                    f"📋 Тип: {template_name}\n"
+                    f"📄 Формат: {_DOC_TYPES[doc_type]}\n"
+                    f"📊 Размер контента: {len(content)} символов"
+                ),
+                parse_mode="HTML"
+            )
         )
         
         # Добавляем в историю и обновляем статистику
@@ -326,27 +429,38 @@ async def document_type_chosen(callback: CallbackQuery, state: FSMContext,
             'content': content,
             'user_request': user_request
         }
-        user_storage.add_to_history(user_id, doc_data)
+        await user_storage.add_to_history(user_id, doc_data)
         word_count = len(content.split())
-        user_storage.update_statistics(user_id, template_type, word_count, is_edit=False)
+        await user_storage.update_statistics(user_id, template_type, word_count, is_edit=False)
         
-        # Предложение действий с документом
-        await callback.message.answer(
-            "✨ Что вы хотите сделать дальше?",
-            reply_markup=get_document_actions_keyboard()
+        # Удаление статуса, сохранение данных документа для возможного
+        # редактирования и предложение действий не зависят друг от друга.
+        # Данные, прочитанные до генерации, могли устареть (ключ удалён,
+        # настройки изменены), поэтому обновляются только новые поля
+        await asyncio.gather(
+            safe_delete_message(status_message),
+            state.update_data(
+                last_content=content,
+                last_template_type=template_type,
+                last_template_name=template_name,
+                last_doc_type=doc_type,
+                last_user_request=user_request
+            ),
+            callback.message.answer(
+                "✨ Что вы хотите сделать дальше?",
+                reply_markup=get_document_actions_keyboard()
+            )
         )
         
         await state.set_state(DocumentGeneration.document_ready)
         
-        logger.info(f"Документ успешно создан и отправлен пользователю {callback.from_user.id}")
+        logger.info("Документ успешно создан и отправлен пользователю %s", callback.from_user.id)
         
     except Exception as e:
-        logger.error(f"Ошибка при генерации документа: {e}")
+        logger.error("Ошибка при генерации документа: %s", e)
         await safe_edit_message(
             status_message,
-            "❌ Произошла ошибка при создании документа.\n"
-            "Пожалуйста, попробуйте ещё раз позже.",
-            send_new_on_fail=True
+            _GENERATION_ERROR_TEXT
         )
         await state.clear()
     
@@ -363,24 +477,20 @@ async def start_document_editing(callback: CallbackQuery, state: FSMContext):
         await state.clear()
         return
     
-    await safe_edit_message(
-        callback.message,
-        "✏️ <b>Редактирование документа</b>\n\n"
-        "Опишите, какие изменения нужно внести в документ.\n\n"
-        "Примеры инструкций:\n"
-        "• 'Добавь раздел о гарантиях'\n"
-        "• 'Сделай текст короче и лаконичнее'\n"
-        "• 'Измени тон на более формальный'\n"
-        "• 'Добавь больше деталей о...'\n"
-        "• 'Убери раздел о...'",
-        parse_mode="HTML",
-        reply_markup=None,
-        send_new_on_fail=True
-    )
-    
-    await callback.message.answer(
-        "Введите инструкции по редактированию:",
-        reply_markup=get_cancel_keyboard()
+    await asyncio.gather(
+        safe_edit_message(
+            callback.message,
+            _EDIT_INSTRUCTIONS_TEXT,
+            parse_mode="HTML",
+            reply_markup=None
+        ),
+        answer_with_keyboard(
+            callback.message,
+            "Введите инструкции по редактированию:",
+            state=state,
+            keyboard="cancel",
+            data=data
+        )
     )
     
     await state.set_state(DocumentEditing.entering_edit_instructions)
@@ -399,15 +509,18 @@ async def start_new_document(callback: CallbackQuery, state: FSMContext, user_st
 async def finish_document_flow(callback: CallbackQuery, state: FSMContext):
     """Завершение работы с документом"""
     await state.clear()
-    await safe_edit_message(
-        callback.message,
-        "✅ Работа с документом завершена.",
-        reply_markup=None,
-        send_new_on_fail=True
-    )
-    await callback.message.answer(
-        "Выберите действие:",
-        reply_markup=get_main_keyboard()
+    await asyncio.gather(
+        safe_edit_message(
+            callback.message,
+            "✅ Работа с документом завершена.",
+            reply_markup=None
+        ),
+        answer_with_keyboard(
+            callback.message,
+            "Выберите действие:",
+            state=state,
+            keyboard="main"
+        )
     )
     await callback.answer()
 
@@ -418,9 +531,12 @@ async def cancel_editing(message: Message, state: FSMContext):
     """Отмена редактирования"""
     data = await state.get_data()
     if data.get('last_content'):
-        await message.answer(
+        await answer_with_keyboard(
+            message,
             "❌ Редактирование отменено.",
-            reply_markup=get_main_keyboard()
+            state=state,
+            keyboard="main",
+            data=data
         )
         await message.answer(
             "Что вы хотите сделать дальше?",
@@ -428,11 +544,13 @@ async def cancel_editing(message: Message, state: FSMContext):
         )
         await state.set_state(DocumentGeneration.document_ready)
     else:
-        await message.answer(
+        await state.clear()
+        await answer_with_keyboard(
+            message,
             "❌ Редактирование отменено.",
-            reply_markup=get_main_keyboard()
+            state=state,
+            keyboard="main"
         )
-        await state.clear()
 
 
 @router.message(DocumentEditing.entering_edit_instructions, F.text)
@@ -447,136 +565,131 @@ async def process_edit_instructions(
     user_id = message.from_user.id
     
     if len(instructions) < 5:
-        await message.answer(
+        await answer_with_keyboard(
+            message,
             "⚠️ Инструкции слишком короткие. Опишите, что нужно изменить более подробно.",
-            reply_markup=get_cancel_keyboard()
+            state=state,
+            keyboard="cancel"
         )
         return
     
+    data = await state.get_data()
+    
     # Проверка наличия API ключа
-    api_key = user_storage.get_api_key(user_id)
+    api_key = data.get('api_key') or await user_storage.get_api_key(user_id)
     if not api_key:
-        await message.answer(
-            "❌ <b>API ключ не найден</b>\n\n"
-            "Пожалуйста, добавьте API ключ перед редактированием документов.",
+        await state.clear()
+        await answer_with_keyboard(
+            message,
+            _API_KEY_NOT_FOUND_EDIT_TEXT,
             parse_mode="HTML",
-            reply_markup=get_main_keyboard()
+            state=state,
+            keyboard="main"
         )
-        await state.clear()
         return
     
-    # Инициализация Gemini сервиса с API ключом пользователя
-    gemini_service = GeminiService(api_key=api_key)
+    # Gemini сервис с API ключом пользователя
+    gemini_service = _get_gemini(api_key)
     
-    data = await state.get_data()
     last_content = data.get('last_content')
     template_type = data.get('last_template_type', 'custom')
     template_name = data.get('last_template_name', 'Документ')
     doc_type = data.get('last_doc_type', 'docx')
     
     if not last_content:
-        await message.answer(
+        await state.clear()
+        await answer_with_keyboard(
+            message,
             "❌ Не удалось получить текущий документ для редактирования. Начните генерацию заново.",
-            reply_markup=get_main_keyboard()
+            state=state,
+            keyboard="main"
         )
-        await state.clear()
         return
     
-    status_message = await message.answer(
-        "✏️ Применяю изменения к документу...\n"
-        "Это может занять 10-30 секунд."
+    logger.info(
+        "Редактирование документа пользователя %s с инструкциями: %s...",
+        message.from_user.id, instructions[:50]
+    )
+    # Редактирование в Gemini идёт параллельно с отправкой статусного
+    # сообщения, а документ собирается по мере поступления текста
+    edit_task = asyncio.create_task(
+        document_service.render_document_stream(
+            gemini_service.stream_edited_content(
+                original_content=last_content,
+                edit_instructions=instructions,
+                template_type=template_type
+            ),
+            doc_type=doc_type,
+            title=template_name,
+            user_id=user_id
+        )
     )
     
     try:
-        logger.info(
-            f"Редактирование документа пользователя {message.from_user.id} с инструкциями: {instructions[:50]}..."
-        )
-        updated_content = await gemini_service.edit_document_content(
-            original_content=last_content,
-            edit_instructions=instructions,
-            template_type=template_type
+        status_message = await message.answer(
+            _EDITING_TEXT
         )
+    except Exception:
+        edit_task.cancel()
+        raise
+    
+    try:
+        rendered = await edit_task
         
-        if not updated_content:
+        if not rendered:
             await safe_edit_message(
                 status_message,
-                "❌ Не удалось применить изменения. Попробуйте сформулировать инструкции иначе.",
-                send_new_on_fail=True
+                "❌ Не удалось применить изменения. Попробуйте сформулировать инструкции иначе."
             )
             await state.set_state(DocumentGeneration.document_ready)
             return
         
-        await safe_edit_message(
-            status_message,
-            "📄 Изменения применены. Создаю обновлённый документ...",
-            send_new_on_fail=True
-        )
-        
-        if doc_type == 'docx':
-            filepath = await document_service.create_word_document(
-                content=updated_content,
-                title=template_name,
-                user_id=message.from_user.id
-            )
-        else:
-            filepath = await document_service.create_pdf_document(
-                content=updated_content,
-                title=template_name,
-                user_id=message.from_user.id
-            )
+        # Файл собран в памяти: отправляем байты без записи и чтения с диска
+        updated_content, filename, file_bytes = rendered
+        document = BufferedInputFile(file_bytes, filename=filename)
         
-        if not filepath:
-            await safe_edit_message(
+        # Новая версия сохраняется в FSM, пока файл уходит в Telegram:
+        # при ошибке отправки состояние всё равно сбрасывается ниже
+        await asyncio.gather(
+            safe_edit_message(
                 status_message,
-                "❌ Не удалось создать обновлённый документ. Попробуйте ещё раз.",
-                send_new_on_fail=True
-            )
-            await state.set_state(DocumentGeneration.document_ready)
-            return
-        
-        await safe_edit_message(
-            status_message,
-            "📤 Отправляю обновлённый документ...",
-            send_new_on_fail=True
-        )
-        document = FSInputFile(filepath)
-        
-        await message.answer_document(
-            document=document,
-            caption=(
-                f"✅ <b>Документ обновлён!</b>\n\n"
-                f"📋 Тип: {template_name}\n"
-                f"📄 Формат: {Config.DOCUMENT_TYPES.get(doc_type, doc_type)}\n"
-                f"📊 Размер контента: {len(updated_content)} символов"
+                _SENDING_UPDATED_TEXT
             ),
-            parse_mode="HTML"
-        )
-        
-        document_service.cleanup_file(filepath)
-        await safe_delete_message(status_message)
-        
-        await state.update_data(
-            last_content=updated_content,
-            last_doc_type=doc_type
+            state.update_data(
+                last_content=updated_content,
+                last_doc_type=doc_type
+            ),
+            state.set_state(DocumentGeneration.document_ready),
+            message.answer_document(
+                document=document,
+                caption=(
+                    f"✅ <b>Документ обновлён!</b>\n\n"
+                    f"📋 Тип: {template_name}\n"
+                    f"📄 Формат: {_DOC_TYPES.get(doc_type, doc_type)}\n"
+                    f"📊 Размер контента: {len(updated_content)} символов"
+                ),
+                parse_mode="HTML"
+            )
         )
         
         # Обновляем статистику редактирования
-        user_storage.update_statistics(user_id, template_type, 0, is_edit=True)
+        await user_storage.update_statistics(user_id, template_type, 0, is_edit=True)
         
-        await message.answer(
-            "✨ Хотите продолжить редактирование или создать новый документ?",
-            reply_markup=get_document_actions_keyboard()
+        await asyncio.gather(
+            safe_delete_message(status_message),
+            message.answer(
+                "✨ Хотите продолжить редактирование или создать новый документ?",
+                reply_markup=get_document_actions_keyboard()
+            )
         )
-        await state.set_state(DocumentGeneration.document_ready)
         
-        logger.info(f"Документ пользователя {message.from_user.id} успешно отредактирован")
+        logger.info("Документ пользователя %s успешно отредактирован", message.from_user.id)
         
     except Exception as e:
-        logger.error(f"Ошибка при редактировании документа: {e}")
+        logger.error("Ошибка при редактировании документа: %s", e)
         await safe_edit_message(
             status_message,
-            "❌ Произошла ошибка при редактировании. Попробуйте позже.",
-            send_new_on_fail=True
+            "❌ Произошла ошибка при редактировании. Попробуйте позже."
         )
         await state.clear()
 
@@ -601,38 +714,37 @@ async def action_convert(callback: CallbackQuery, state: FSMContext, document_se
     
     try:
         if new_type == 'docx':
-            filepath = await document_service.create_word_document(
+            rendered = await document_service.render_word_document(
                 content=content,
                 title=template_name,
                 user_id=callback.from_user.id
             )
         else:
-            filepath = await document_service.create_pdf_document(
+            rendered = await document_service.render_pdf_document(
                 content=content,
                 title=template_name,
                 user_id=callback.from_user.id
             )
         
-        if filepath:
-            document = FSInputFile(filepath)
+        if rendered:
+            filename, file_bytes = rendered
+            document = BufferedInputFile(file_bytes, filename=filename)
             await callback.message.answer_document(
                 document=document,
-                caption=f"✅ Документ конвертирован в {Config.DOCUMENT_TYPES.get(new_type)}",
+                caption=f"✅ Документ конвертирован в {_DOC_TYPES.get(new_type)}",
                 parse_mode="HTML"
             )
-            document_service.cleanup_file(filepath)
             await state.update_data(last_doc_type=new_type)
         else:
-            await status_msg.edit_text("❌ Ошибка при конвертации документа")
+            await safe_edit_message(status_msg, "❌ Ошибка при конвертации документа")
         
         await safe_delete_message(status_msg)
         
     except Exception as e:
-        logger.error(f"Ошибка при конвертации документа: {e}")
+        logger.error("Ошибка при конвертации документа: %s", e)
         await safe_edit_message(
             status_msg,
-            "❌ Произошла ошибка при конвертации",
-            send_new_on_fail=True
+            "❌ Произошла ошибка при конвертации"
         )
     
     await callback.answer()
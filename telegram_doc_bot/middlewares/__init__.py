@@ -0,0 +1,6 @@
+"""Модуль middleware для диспетчера"""
+
+from .concurrency import ConcurrencyLimitMiddleware
+from .rate_limit import RateLimitMiddleware
+
+__all__ = ['ConcurrencyLimitMiddleware', 'RateLimitMiddleware']
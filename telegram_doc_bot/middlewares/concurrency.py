@@ -0,0 +1,38 @@
+"""
+Middleware для ограничения числа одновременно обрабатываемых обновлений
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничивает количество обновлений, обрабатываемых одновременно.
+    
+    Polling запускает каждое обновление отдельной задачей, поэтому
+    медленный обработчик (Gemini, генерация файла) не блокирует остальных
+    пользователей. Семафор не даёт всплеску запросов породить
+    неограниченное число параллельных обращений к Gemini API.
+    """
+    
+    def __init__(self, limit: int = 32):
+        """
+        Инициализация middleware
+        
+        Args:
+            limit: Максимальное число одновременно обрабатываемых обновлений
+        """
+        self._semaphore = asyncio.Semaphore(limit)
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Исключения обработчиков логирует сам диспетчер (_process_update)
+        async with self._semaphore:
+            return await handler(event, data)
@@ -0,0 +1,98 @@
+"""
+Middleware сессии для ограничения частоты исходящих сообщений
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Union
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+# Методы, на которые распространяются лимиты Telegram на сообщения
+_LIMITED_PREFIXES = ('send', 'edit', 'copy', 'forward')
+
+# Максимальное число чатов, для которых хранится состояние лимита
+_MAX_TRACKED_CHATS = 10000
+
+
+class _TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity в запасе"""
+    
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+    
+    def reserve(self) -> float:
+        """
+        Резервирование токена
+        
+        Запас может уйти в минус: каждый вызов получает свою очередь,
+        и блокировка не нужна.
+        
+        Returns:
+            Сколько секунд подождать до использования токена
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Ограничивает частоту отправки и редактирования сообщений.
+    
+    Запросы придерживаются до отправки, чтобы укладываться в лимиты
+    Telegram (около 30 сообщений в секунду на бота и 1 в секунду на чат),
+    а не упираться в ошибку 429 и ждать retry_after. Остальные методы
+    (getUpdates, answerCallbackQuery, deleteMessage) не ограничиваются.
+    """
+    
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: int = 5):
+        """
+        Инициализация middleware
+        
+        Args:
+            global_rate: Сообщений в секунду на весь бот
+            chat_rate: Сообщений в секунду на один чат
+            chat_burst: Сколько сообщений подряд можно отправить в чат без ожидания
+        """
+        self._global = _TokenBucket(global_rate, global_rate)
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._chats: "OrderedDict[Union[int, str], _TokenBucket]" = OrderedDict()
+    
+    def _chat_bucket(self, chat_id: Union[int, str]) -> _TokenBucket:
+        """Ведро токенов чата с вытеснением давно не использованных"""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = _TokenBucket(self._chat_rate, self._chat_burst)
+            self._chats[chat_id] = bucket
+            if len(self._chats) > _MAX_TRACKED_CHATS:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        if method.__api_method__.startswith(_LIMITED_PREFIXES):
+            delay = self._global.reserve()
+            chat_id = getattr(method, 'chat_id', None)
+            if chat_id is not None:
+                delay = max(delay, self._chat_bucket(chat_id).reserve())
+            if delay:
+                await asyncio.sleep(delay)
+        return await make_request(bot, method)
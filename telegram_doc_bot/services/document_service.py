@@ -4,15 +4,21 @@
 Поддерживает парсинг Markdown разметки.
 """
 
+import asyncio
+import functools
+import hashlib
+import io
 import logging
 import os
 import re
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, List, Tuple
+from typing import AsyncIterator, BinaryIO, Dict, Iterator, Optional, Tuple, Union
 from docx import Document
 from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
+from lxml import etree
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -23,6 +29,69 @@ from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
 
 logger = logging.getLogger(__name__)
 
+# Регулярные выражения Markdown компилируются один раз при импорте модуля
+# Строчные элементы: заголовок, маркированный и нумерованный списки
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.+)$')
+_LIST_RE = re.compile(r'^[\*\-\•]\s+(.+)$')
+_NUM_RE = re.compile(r'^(\d+)\.\s+(.+)$')
+
+# Форматирование внутри строки одним выражением: жирный (**text** или
+# __text__), курсив (*text* или _text_, но не внутри слова) и код (`text`);
+# вид элемента определяется номером совпавшей группы
+_INLINE_RE = re.compile(
+    r'\*\*(.+?)\*\*|__(.+?)__'
+    r'|(?<!\w)\*(?!\*)(.+?)(?<!\*)\*(?!\w)|(?<!\w)_(?!_)(.+?)(?<!_)_(?!\w)'
+    r'|`(.+?)`'
+)
+
+# Оформление фрагмента Word по номеру группы _INLINE_RE (0 - обычный текст):
+# (шрифт, размер в пунктах, жирный, курсив); None - как в стиле Normal
+_INLINE_RUN_FORMATS = {
+    0: (None, None, False, False),
+    1: (None, None, True, False),
+    2: (None, None, True, False),
+    3: (None, None, False, True),
+    4: (None, None, False, True),
+    5: ('Courier New', 11, False, False),
+}
+
+# Замены Markdown на разметку ReportLab
+_BOLD_STAR_RE = re.compile(r'\*\*(.+?)\*\*')
+_BOLD_UNDERSCORE_RE = re.compile(r'__(.+?)__')
+_ITALIC_STAR_RE = re.compile(r'(?<!\w)\*(?!\*)(.+?)(?<!\*)\*(?!\w)')
+_ITALIC_UNDERSCORE_RE = re.compile(r'(?<!\w)_(?!_)(.+?)(?<!_)_(?!\w)')
+_CODE_RE = re.compile(r'`(.+?)`')
+
+# Размеры и поля документа Word создаются один раз при импорте
+_PT12 = Pt(12)
+_PT11 = Pt(11)
+_PT10 = Pt(10)
+_IN1 = Inches(1)
+_IN125 = Inches(1.25)
+
+# Число готовых документов, хранимых в памяти для повторной выдачи
+_RENDER_CACHE_SIZE = 64
+
+
+def _iter_lines(content: str) -> Iterator[str]:
+    """
+    Построчный обход текста без создания списка всех строк
+    
+    Args:
+        content: Текст документа
+    
+    Yields:
+        Строки текста без символа перевода строки (как content.split('\\n'))
+    """
+    start = 0
+    while True:
+        end = content.find('\n', start)
+        if end == -1:
+            yield content[start:]
+            return
+        yield content[start:end]
+        start = end + 1
+
 
 class DocumentService:
     """Класс для создания документов в различных форматах"""
@@ -36,14 +105,25 @@ class DocumentService:
         """
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
+        # Стили PDF создаются один раз и переиспользуются всеми документами
+        self._pdf_styles = self._build_pdf_styles()
+        # Недавно собранные документы: конвертация туда и обратно
+        # не пересобирает уже готовый файл
+        self._render_cache: "OrderedDict[bytes, bytes]" = OrderedDict()
         logger.info(f"Document сервис инициализирован, директория: {output_dir}")
     
-    def _parse_markdown_line(self, line: str) -> Tuple[str, str, int]:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _parse_markdown_line(line: str) -> Tuple[str, str, int]:
         """
         Парсинг markdown строки для определения типа и уровня
         
+        Результат зависит только от строки и кэшируется: сгенерированные
+        документы часто повторяют одинаковые строки.
+        
         Args:
-            line: Строка текста с возможной markdown разметкой
+            line: Строка текста с возможной markdown разметкой, уже
+                очищенная от пробелов по краям
         
         Returns:
             Tuple[type, text, level] где:
@@ -51,29 +131,67 @@ class DocumentService:
             - text: очищенный текст
             - level: уровень заголовка или списка
         """
-        line = line.strip()
+        # Разметка строки определяется первым символом: обычный текст
+        # отсекается без запуска регулярных выражений
+        first = line[:1]
         
         # Проверка на заголовок
-        heading_match = re.match(r'^(#{1,6})\s+(.+)$', line)
-        if heading_match:
-            level = len(heading_match.group(1))
-            text = heading_match.group(2).strip()
-            return ('heading', text, level)
+        if first == '#':
+            heading_match = _HEADING_RE.match(line)
+            if heading_match:
+                level = len(heading_match.group(1))
+                text = heading_match.group(2)
+                return ('heading', text, level)
         
         # Проверка на маркированный список
-        list_match = re.match(r'^[\*\-\•]\s+(.+)$', line)
-        if list_match:
-            text = list_match.group(1).strip()
-            return ('list', text, 0)
+        elif first in ('*', '-', '•'):
+            list_match = _LIST_RE.match(line)
+            if list_match:
+                text = list_match.group(1)
+                return ('list', text, 0)
         
         # Проверка на нумерованный список
-        numbered_match = re.match(r'^(\d+)\.\s+(.+)$', line)
-        if numbered_match:
-            text = numbered_match.group(2).strip()
-            return ('numbered_list', text, 0)
+        elif first.isdigit():
+            numbered_match = _NUM_RE.match(line)
+            if numbered_match:
+                text = numbered_match.group(2)
+                return ('numbered_list', text, 0)
         
         return ('text', line, 0)
     
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _tokenize_inline(text: str) -> Tuple[Tuple[int, str], ...]:
+        """
+        Разбиение строки на фрагменты с markdown форматированием
+        
+        Строка просматривается за один проход; результат кэшируется, как
+        и разбор типа строки, поэтому повторная сборка того же текста
+        (например, при конвертации в другой формат) не запускает regex.
+        
+        Args:
+            text: Текст с markdown разметкой
+        
+        Returns:
+            Кортеж пар (номер группы _INLINE_RE или 0 для обычного текста, текст)
+        """
+        tokens = []
+        pos = 0
+        for match in _INLINE_RE.finditer(text):
+            # Обычный текст до элемента форматирования
+            if match.start() > pos:
+                tokens.append((0, text[pos:match.start()]))
+            
+            # Номер совпавшей группы определяет вид форматирования
+            tokens.append((match.lastindex, match.group(match.lastindex)))
+            pos = match.end()
+        
+        # Остаток строки - обычный текст
+        if pos < len(text):
+            tokens.append((0, text[pos:]))
+        
+        return tuple(tokens)
+    
     def _apply_markdown_formatting(self, paragraph, text: str):
         """
         Применение markdown форматирования к тексту параграфа
@@ -82,78 +200,63 @@ class DocumentService:
             paragraph: Параграф документа Word
             text: Текст с markdown разметкой
         """
-        # Сложный паттерн для обнаружения всех типов форматирования
-        # Обрабатываем по порядку: жирный, курсив, код
-        parts = []
-        current_pos = 0
-        
-        # Паттерн для жирного текста: **text** или __text__
-        bold_pattern = r'\*\*(.+?)\*\*|__(.+?)__'
-        # Паттерн для курсива: *text* или _text_ (но не внутри слова)
-        italic_pattern = r'(?<!\w)\*(?!\*)(.+?)(?<!\*)\*(?!\w)|(?<!\w)_(?!_)(.+?)(?<!_)_(?!\w)'
-        # Паттерн для кода: `text`
-        code_pattern = r'`(.+?)`'
-        
-        # Сначала заменяем код на плейсхолдеры, чтобы не конфликтовало с другим форматированием
-        code_replacements = []
-        for match in re.finditer(code_pattern, text):
-            placeholder = f"__CODE_{len(code_replacements)}__"
-            code_replacements.append(match.group(1))
-            text = text[:match.start()] + placeholder + text[match.end():]
-        
-        # Теперь обрабатываем весь текст
-        pos = 0
-        while pos < len(text):
-            # Проверяем на жирный текст
-            bold_match = re.match(r'\*\*(.+?)\*\*|__(.+?)__', text[pos:])
-            if bold_match:
-                inner_text = bold_match.group(1) or bold_match.group(2)
-                run = paragraph.add_run(inner_text)
-                run.font.name = 'Times New Roman'
-                run.font.size = Pt(12)
+        for kind, fragment in self._tokenize_inline(text):
+            self._add_formatted_run(paragraph, fragment, *_INLINE_RUN_FORMATS[kind])
+    
+    def _add_formatted_run(
+        self,
+        paragraph,
+        text: str,
+        font_name: Optional[str] = None,
+        size: Optional[int] = None,
+        bold: bool = False,
+        italic: bool = False
+    ):
+        """
+        Добавление фрагмента текста в параграф напрямую через lxml
+        
+        Элементы <w:r> собираются без объектной обёртки python-docx, но
+        в том же виде, что дают add_run() и свойства run.font. Свойства,
+        совпадающие со стилем Normal, не записываются.
+        
+        Args:
+            paragraph: Параграф документа Word
+            text: Текст фрагмента
+            font_name: Название шрифта, если отличается от стиля
+            size: Размер шрифта в пунктах, если отличается от стиля
+            bold: Жирное начертание
+            italic: Курсивное начертание
+        """
+        if '\t' in text or '\n' in text or '\r' in text:
+            # Табуляции и переводы строк python-docx превращает в отдельные элементы
+            run = paragraph.add_run(text)
+            if font_name:
+                run.font.name = font_name
+            if size:
+                run.font.size = Pt(size)
+            if bold:
                 run.bold = True
-                pos += bold_match.end()
-                continue
-            
-            # Проверяем на курсив
-            italic_match = re.match(r'(?<!\w)\*(?!\*)(.+?)(?<!\*)\*(?!\w)|(?<!\w)_(?!_)(.+?)(?<!_)_(?!\w)', text[pos:])
-            if italic_match:
-                inner_text = italic_match.group(1) or italic_match.group(2)
-                run = paragraph.add_run(inner_text)
-                run.font.name = 'Times New Roman'
-                run.font.size = Pt(12)
+            if italic:
                 run.italic = True
-                pos += italic_match.end()
-                continue
-            
-            # Проверяем на плейсхолдер кода
-            code_match = re.match(r'__CODE_(\d+)__', text[pos:])
-            if code_match:
-                code_index = int(code_match.group(1))
-                inner_text = code_replacements[code_index]
-                run = paragraph.add_run(inner_text)
-                run.font.name = 'Courier New'
-                run.font.size = Pt(11)
-                pos += code_match.end()
-                continue
-            
-            # Обычный текст - находим до следующего форматирования
-            next_format = re.search(r'\*\*|__|\*(?!\*)|_(?!_)|__CODE_\d+__', text[pos:])
-            if next_format:
-                plain_text = text[pos:pos + next_format.start()]
-                if plain_text:
-                    run = paragraph.add_run(plain_text)
-                    run.font.name = 'Times New Roman'
-                    run.font.size = Pt(12)
-                pos += next_format.start()
-            else:
-                # Остаток строки - обычный текст
-                plain_text = text[pos:]
-                if plain_text:
-                    run = paragraph.add_run(plain_text)
-                    run.font.name = 'Times New Roman'
-                    run.font.size = Pt(12)
-                break
+            return
+        
+        r = etree.SubElement(paragraph._p, qn('w:r'))
+        if font_name or size or bold or italic:
+            rPr = etree.SubElement(r, qn('w:rPr'))
+            if font_name:
+                fonts = etree.SubElement(rPr, qn('w:rFonts'))
+                fonts.set(qn('w:ascii'), font_name)
+                fonts.set(qn('w:hAnsi'), font_name)
+            if bold:
+                etree.SubElement(rPr, qn('w:b'))
+            if italic:
+                etree.SubElement(rPr, qn('w:i'))
+            if size:
+                etree.SubElement(rPr, qn('w:sz')).set(qn('w:val'), str(size * 2))
+        t = etree.SubElement(r, qn('w:t'))
+        t.text = text
+        if len(text.strip()) < len(text):
+            t.set(qn('xml:space'), 'preserve')
     
     def _process_content_lines(self, doc: Document, content: str):
         """
@@ -163,94 +266,337 @@ class DocumentService:
             doc: Документ Word
             content: Текстовое содержимое с markdown
         """
-        lines = content.split('\n')
-        i = 0
-        list_items = []
-        current_list_type = None
+        list_state = (None, 0)
+        for line in _iter_lines(content):
+            list_state = self._add_content_line(doc, line, list_state)
+    
+    def _add_content_line(
+        self,
+        doc: Document,
+        line: str,
+        list_state: Tuple[Optional[str], int]
+    ) -> Tuple[Optional[str], int]:
+        """
+        Добавление одной строки контента с учетом markdown разметки
         
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            if not line:
-                # Пустая строка - завершаем список если он был
-                if list_items:
-                    self._add_list_to_doc(doc, list_items, current_list_type)
-                    list_items = []
-                    current_list_type = None
-                i += 1
-                continue
-            
-            line_type, text, level = self._parse_markdown_line(line)
-            
-            if line_type == 'heading':
-                # Завершаем список если он был
-                if list_items:
-                    self._add_list_to_doc(doc, list_items, current_list_type)
-                    list_items = []
-                    current_list_type = None
-                
-                # Добавляем заголовок
-                heading = doc.add_heading(text, level=min(level + 1, 9))
-                if level == 1:
-                    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                
-            elif line_type in ('list', 'numbered_list'):
-                # Если тип списка изменился, завершаем предыдущий
-                if current_list_type and current_list_type != line_type:
-                    self._add_list_to_doc(doc, list_items, current_list_type)
-                    list_items = []
-                
-                current_list_type = line_type
-                list_items.append(text)
-                
-            else:
-                # Обычный текст
-                # Завершаем список если он был
-                if list_items:
-                    self._add_list_to_doc(doc, list_items, current_list_type)
-                    list_items = []
-                    current_list_type = None
-                
-                # Добавляем параграф с форматированием
-                para = doc.add_paragraph()
-                para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-                self._apply_markdown_formatting(para, text)
-            
-            i += 1
+        Строка не зависит от следующих за ней, поэтому документ можно
+        собирать по мере поступления текста.
+        
+        Args:
+            doc: Документ Word
+            line: Строка текста с markdown
+            list_state: Тип текущего списка и число его элементов
+        
+        Returns:
+            Состояние списка после добавления строки
+        """
+        line = line.strip()
+        
+        if not line:
+            # Пустая строка завершает список
+            return (None, 0)
+        
+        line_type, text, level = self._parse_markdown_line(line)
         
-        # Завершаем список в конце если он остался
-        if list_items:
-            self._add_list_to_doc(doc, list_items, current_list_type)
+        if line_type == 'heading':
+            # Добавляем заголовок
+            heading = doc.add_heading(text, level=min(level + 1, 9))
+            if level == 1:
+                heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            return (None, 0)
+        
+        if line_type in ('list', 'numbered_list'):
+            # Если тип списка изменился, нумерация начинается заново
+            list_type, count = list_state
+            if list_type != line_type:
+                count = 0
+            self._add_list_item(doc, text, line_type, count + 1)
+            return (line_type, count + 1)
+        
+        # Обычный текст - добавляем параграф с форматированием
+        para = doc.add_paragraph()
+        para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        self._apply_markdown_formatting(para, text)
+        return (None, 0)
     
-    def _add_list_to_doc(self, doc: Document, items: List[str], list_type: str):
+    def _add_list_item(self, doc: Document, text: str, list_type: str, number: int):
         """
-        Добавление списка в документ
+        Добавление элемента списка в документ
         
         Args:
             doc: Документ Word
-            items: Список элементов
+            text: Текст элемента
             list_type: Тип списка ('list' или 'numbered_list')
+            number: Порядковый номер элемента в списке
         """
-        for i, item in enumerate(items):
-            if list_type == 'numbered_list':
-                para = doc.add_paragraph(style='List Number')
-            else:
-                para = doc.add_paragraph(style='List Bullet')
-            
-            # Очищаем параграф и добавляем с форматированием
-            para.clear()
-            if list_type == 'numbered_list':
-                # Для нумерованного списка добавляем номер
-                run = para.add_run(f"{i + 1}. ")
-                run.font.name = 'Times New Roman'
-                run.font.size = Pt(12)
-            else:
-                # Для маркированного - маркер
-                run = para.add_run("• ")
-                run.font.name = 'Times New Roman'
-                run.font.size = Pt(12)
-            
-            self._apply_markdown_formatting(para, item)
+        if list_type == 'numbered_list':
+            para = doc.add_paragraph(style='List Number')
+        else:
+            para = doc.add_paragraph(style='List Bullet')
+        
+        # Очищаем параграф и добавляем с форматированием
+        para.clear()
+        if list_type == 'numbered_list':
+            # Для нумерованного списка добавляем номер
+            para.add_run(f"{number}. ")
+        else:
+            # Для маркированного - маркер
+            para.add_run("• ")
+        
+        self._apply_markdown_formatting(para, text)
+    
+    def _make_filename(self, user_id: int, extension: str, created: datetime) -> str:
+        """
+        Генерация имени файла документа
+        
+        Args:
+            user_id: ID пользователя
+            extension: Расширение файла без точки
+            created: Время создания документа
+        
+        Returns:
+            Имя файла вида document_<user_id>_<timestamp>.<extension>
+        """
+        timestamp = created.strftime('%Y%m%d_%H%M%S')
+        return f"document_{user_id}_{timestamp}.{extension}"
+    
+    def _build_word_document(self, content: str, title: str, created: datetime) -> Document:
+        """
+        Построение документа Word с поддержкой Markdown
+        
+        Args:
+            content: Текстовое содержимое документа с Markdown разметкой
+            title: Заголовок документа
+            created: Время создания документа
+        
+        Returns:
+            Готовый к сохранению документ Word
+        """
+        doc = self._start_word_document(title, created)
+        
+        # Обработка контента с markdown
+        self._process_content_lines(doc, content)
+        
+        return doc
+    
+    def _start_word_document(self, title: str, created: datetime) -> Document:
+        """
+        Создание документа Word с полями, заголовком и датой
+        
+        Args:
+            title: Заголовок документа
+            created: Время создания документа
+        
+        Returns:
+            Документ Word, готовый к добавлению контента
+        """
+        # Создание нового документа
+        doc = Document()
+        
+        # Шрифт основного текста задаётся стилем один раз, а не каждому фрагменту
+        normal_font = doc.styles['Normal'].font
+        normal_font.name = 'Times New Roman'
+        normal_font.size = _PT12
+        # Заголовки 3-7 уровня своего размера не имеют и унаследовали бы
+        # его от Normal: сохраняем прежние 11 пт шаблона
+        for level in range(3, 8):
+            heading_font = doc.styles[f'Heading {level}'].font
+            if heading_font.size is None:
+                heading_font.size = _PT11
+        
+        # Настройка параметров документа
+        sections = doc.sections
+        for section in sections:
+            section.top_margin = _IN1
+            section.bottom_margin = _IN1
+            section.left_margin = _IN125
+            section.right_margin = _IN1
+        
+        # Добавление основного заголовка
+        heading = doc.add_heading(title, level=0)
+        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Добавление даты
+        date_paragraph = doc.add_paragraph()
+        date_run = date_paragraph.add_run(
+            f"Дата создания: {created.strftime('%d.%m.%Y')}"
+        )
+        date_run.font.name = 'Times New Roman'
+        date_run.font.size = _PT10
+        date_run.italic = True
+        date_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        
+        # Добавляем разделитель
+        doc.add_paragraph()
+        
+        return doc
+    
+    def _write_word_document(
+        self,
+        target: Union[str, BinaryIO],
+        content: str,
+        title: str,
+        created: datetime
+    ):
+        """
+        Построение и сохранение документа Word
+        
+        Args:
+            target: Путь к файлу или двоичный буфер для записи документа
+            content: Текстовое содержимое документа с Markdown разметкой
+            title: Заголовок документа
+            created: Время создания документа
+        """
+        self._build_word_document(content, title, created).save(target)
+    
+    def _build_pdf_document(
+        self,
+        target: Union[str, BinaryIO],
+        content: str,
+        title: str,
+        created: datetime
+    ):
+        """
+        Построение PDF документа
+        
+        Args:
+            target: Путь к файлу или двоичный буфер для записи PDF
+            content: Текстовое содержимое документа
+            title: Заголовок документа
+            created: Время создания документа
+        """
+        # Контейнер для элементов документа
+        story = self._start_pdf_story(title, created)
+        
+        # Обработка контента построчно
+        for line in _iter_lines(content):
+            story.append(self._pdf_line_flowable(line))
+        
+        self._write_pdf(target, story)
+    
+    def _build_pdf_styles(self) -> Dict[str, ParagraphStyle]:
+        """
+        Создание стилей абзацев PDF документа
+        
+        Returns:
+            Словарь стилей: 'title', 'body', 'heading', 'list'
+        """
+        styles = getSampleStyleSheet()
+        
+        # Стиль для заголовка
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            textColor='black',
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Times-Bold'
+        )
+        
+        # Стиль для основного текста
+        body_style = ParagraphStyle(
+            'CustomBody',
+            parent=styles['BodyText'],
+            fontSize=12,
+            leading=16,
+            alignment=TA_JUSTIFY,
+            fontName='Times-Roman',
+            spaceAfter=12
+        )
+        
+        # Стиль для подзаголовков
+        heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor='black',
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Times-Bold'
+        )
+        
+        # Стиль для списков
+        list_style = ParagraphStyle(
+            'CustomList',
+            parent=styles['BodyText'],
+            fontSize=12,
+            leading=14,
+            leftIndent=20,
+            fontName='Times-Roman',
+            spaceAfter=6
+        )
+        
+        return {
+            'title': title_style,
+            'body': body_style,
+            'heading': heading_style,
+            'list': list_style
+        }
+    
+    def _start_pdf_story(self, title: str, created: datetime) -> list:
+        """
+        Начальные элементы PDF документа: заголовок и дата
+        
+        Args:
+            title: Заголовок документа
+            created: Время создания документа
+        
+        Returns:
+            Список элементов, к которому добавляется контент
+        """
+        story = []
+        
+        # Добавление заголовка
+        story.append(Paragraph(title, self._pdf_styles['title']))
+        
+        # Добавление даты
+        date_text = f"<i>Дата создания: {created.strftime('%d.%m.%Y')}</i>"
+        story.append(Paragraph(date_text, self._pdf_styles['body']))
+        story.append(Spacer(1, 0.3 * inch))
+        
+        return story
+    
+    def _pdf_line_flowable(self, line: str):
+        """
+        Элемент PDF документа для одной строки контента
+        
+        Args:
+            line: Строка текста с markdown
+        
+        Returns:
+            Абзац или отступ ReportLab
+        """
+        line = line.strip()
+        if not line:
+            return Spacer(1, 0.1 * inch)
+        
+        line_type, text, level = self._parse_markdown_line(line)
+        
+        # Экранирование HTML символов
+        text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        
+        # Применение markdown форматирования для PDF
+        text = self._convert_markdown_to_html(text)
+        
+        if line_type == 'heading':
+            return Paragraph(text, self._pdf_styles['heading'])
+        if line_type in ('list', 'numbered_list'):
+            return Paragraph(f"• {text}", self._pdf_styles['list'])
+        return Paragraph(text, self._pdf_styles['body'])
+    
+    def _write_pdf(self, target: Union[str, BinaryIO], story: list):
+        """
+        Сборка PDF документа из готовых элементов
+        
+        Args:
+            target: Путь к файлу или двоичный буфер для записи PDF
+            story: Элементы документа
+        """
+        doc = SimpleDocTemplate(target, pagesize=A4,
+                                rightMargin=inch, leftMargin=inch,
+                                topMargin=inch, bottomMargin=inch)
+        doc.build(story)
     
     async def create_word_document(
         self,
@@ -270,45 +616,13 @@ class DocumentService:
             Путь к созданному файлу или None в случае ошибки
         """
         try:
-            # Создание нового документа
-            doc = Document()
+            created = datetime.now()
+            filepath = os.path.join(self.output_dir, self._make_filename(user_id, 'docx', created))
             
-            # Настройка параметров документа
-            sections = doc.sections
-            for section in sections:
-                section.top_margin = Inches(1)
-                section.bottom_margin = Inches(1)
-                section.left_margin = Inches(1.25)
-                section.right_margin = Inches(1)
-            
-            # Добавление основного заголовка
-            heading = doc.add_heading(title, level=0)
-            heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            # Добавление даты
-            date_paragraph = doc.add_paragraph()
-            date_run = date_paragraph.add_run(
-                f"Дата создания: {datetime.now().strftime('%d.%m.%Y')}"
-            )
-            date_run.font.name = 'Times New Roman'
-            date_run.font.size = Pt(10)
-            date_run.italic = True
-            date_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            
-            # Добавляем разделитель
-            doc.add_paragraph()
-            
-            # Обработка контента с markdown
-            self._process_content_lines(doc, content)
-            
-            # Генерация имени файла
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"document_{user_id}_{timestamp}.docx"
-            filepath = os.path.join(self.output_dir, filename)
-            
-            # Сохранение документа
-            doc.save(filepath)
-            logger.info(f"Word документ создан: {filepath}")
+            # Построение и сохранение документа в отдельном потоке,
+            # чтобы не блокировать цикл событий бота
+            await asyncio.to_thread(self._write_word_document, filepath, content, title, created)
+            logger.info("Word документ создан: %s", filepath)
             
             return filepath
             
@@ -316,129 +630,207 @@ class DocumentService:
             logger.error(f"Ошибка при создании Word документа: {e}")
             return None
     
-    async def create_pdf_document(
+    async def render_word_document(
         self,
         content: str,
         title: str = "Документ",
         user_id: int = 0
-    ) -> Optional[str]:
+    ) -> Optional[Tuple[str, bytes]]:
         """
-        Создание PDF документа
+        Создание документа Word (.docx) в памяти, без записи на диск
         
         Args:
-            content: Текстовое содержимое документа
+            content: Текстовое содержимое документа с Markdown разметкой
             title: Заголовок документа
             user_id: ID пользователя для имени файла
         
         Returns:
-            Путь к созданному файлу или None в случае ошибки
+            Кортеж (имя файла, содержимое) или None в случае ошибки
         """
         try:
-            # Генерация имени файла
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"document_{user_id}_{timestamp}.pdf"
-            filepath = os.path.join(self.output_dir, filename)
-            
-            # Создание PDF документа
-            doc = SimpleDocTemplate(filepath, pagesize=A4,
-                                   rightMargin=inch, leftMargin=inch,
-                                   topMargin=inch, bottomMargin=inch)
+            created = datetime.now()
+            filename = self._make_filename(user_id, 'docx', created)
+            key = self._render_cache_key('docx', content, title, created)
             
-            # Контейнер для элементов документа
-            story = []
-            
-            # Стили
-            styles = getSampleStyleSheet()
-            
-            # Стиль для заголовка
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                textColor='black',
-                spaceAfter=30,
-                alignment=TA_CENTER,
-                fontName='Times-Bold'
-            )
-            
-            # Стиль для основного текста
-            body_style = ParagraphStyle(
-                'CustomBody',
-                parent=styles['BodyText'],
-                fontSize=12,
-                leading=16,
-                alignment=TA_JUSTIFY,
-                fontName='Times-Roman',
-                spaceAfter=12
-            )
+            data = self._get_cached_render(key)
+            if data is None:
+                buffer = io.BytesIO()
+                await asyncio.to_thread(self._write_word_document, buffer, content, title, created)
+                data = buffer.getvalue()
+                self._cache_render(key, data)
+                logger.info("Word документ создан в памяти: %s", filename)
+            else:
+                logger.info("Word документ взят из кэша: %s", filename)
             
-            # Стиль для подзаголовков
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=14,
-                textColor='black',
-                spaceAfter=12,
-                spaceBefore=12,
-                fontName='Times-Bold'
-            )
+            return filename, data
             
-            # Стиль для списков
-            list_style = ParagraphStyle(
-                'CustomList',
-                parent=styles['BodyText'],
-                fontSize=12,
-                leading=14,
-                leftIndent=20,
-                fontName='Times-Roman',
-                spaceAfter=6
-            )
+        except Exception as e:
+            logger.error(f"Ошибка при создании Word документа: {e}")
+            return None
+    
+    async def render_pdf_document(
+        self,
+        content: str,
+        title: str = "Документ",
+        user_id: int = 0
+    ) -> Optional[Tuple[str, bytes]]:
+        """
+        Создание PDF документа в памяти, без записи на диск
+        
+        Args:
+            content: Текстовое содержимое документа
+            title: Заголовок документа
+            user_id: ID пользователя для имени файла
+        
+        Returns:
+            Кортеж (имя файла, содержимое) или None в случае ошибки
+        """
+        try:
+            created = datetime.now()
+            filename = self._make_filename(user_id, 'pdf', created)
+            key = self._render_cache_key('pdf', content, title, created)
             
-            # Добавление заголовка
-            story.append(Paragraph(title, title_style))
+            data = self._get_cached_render(key)
+            if data is None:
+                buffer = io.BytesIO()
+                await asyncio.to_thread(self._build_pdf_document, buffer, content, title, created)
+                data = buffer.getvalue()
+                self._cache_render(key, data)
+                logger.info("PDF документ создан в памяти: %s", filename)
+            else:
+                logger.info("PDF документ взят из кэша: %s", filename)
             
-            # Добавление даты
-            date_text = f"<i>Дата создания: {datetime.now().strftime('%d.%m.%Y')}</i>"
-            story.append(Paragraph(date_text, body_style))
-            story.append(Spacer(1, 0.3 * inch))
+            return filename, data
             
-            # Обработка контента построчно
-            lines = content.split('\n')
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    story.append(Spacer(1, 0.1 * inch))
-                    continue
-                
-                line_type, text, level = self._parse_markdown_line(line)
-                
-                # Экранирование HTML символов
-                text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        except Exception as e:
+            logger.error(f"Ошибка при создании PDF документа: {e}")
+            return None
+    
+    async def render_document_stream(
+        self,
+        chunks: AsyncIterator[str],
+        doc_type: str,
+        title: str = "Документ",
+        user_id: int = 0
+    ) -> Optional[Tuple[str, str, bytes]]:
+        """
+        Создание документа в памяти по мере поступления текста
+        
+        Каждая завершённая строка сразу добавляется в документ, пока
+        нейросеть генерирует следующие; после окончания потока остаётся
+        только сохранить результат.
+        
+        Args:
+            chunks: Фрагменты текста с Markdown разметкой
+            doc_type: Формат документа ('docx' или 'pdf')
+            title: Заголовок документа
+            user_id: ID пользователя для имени файла
+        
+        Returns:
+            Кортеж (полный текст, имя файла, содержимое) или None в случае ошибки
+        """
+        try:
+            created = datetime.now()
+            if doc_type == 'docx':
+                doc = self._start_word_document(title, created)
+                list_state = (None, 0)
                 
-                # Применение markdown форматирования для PDF
-                text = self._convert_markdown_to_html(text)
+                def add_line(line: str):
+                    nonlocal list_state
+                    list_state = self._add_content_line(doc, line, list_state)
+            else:  # pdf
+                story = self._start_pdf_story(title, created)
                 
-                if line_type == 'heading':
-                    story.append(Paragraph(text, heading_style))
-                elif line_type in ('list', 'numbered_list'):
-                    if line_type == 'numbered_list':
-                        text = f"• {text}"
-                    else:
-                        text = f"• {text}"
-                    story.append(Paragraph(text, list_style))
-                else:
-                    story.append(Paragraph(text, body_style))
+                def add_line(line: str):
+                    story.append(self._pdf_line_flowable(line))
             
-            # Сборка документа
-            doc.build(story)
-            logger.info(f"PDF документ создан: {filepath}")
+            parts = []
+            pending = ''
+            async for chunk in chunks:
+                parts.append(chunk)
+                *lines, pending = (pending + chunk).split('\n')
+                for line in lines:
+                    add_line(line)
             
-            return filepath
+            content = ''.join(parts)
+            if not content:
+                logger.error("Нейросеть вернула пустой текст документа")
+                return None
+            add_line(pending)
+            
+            # Строки уже добавлены, в отдельном потоке остаётся только сохранение
+            buffer = io.BytesIO()
+            if doc_type == 'docx':
+                await asyncio.to_thread(doc.save, buffer)
+            else:
+                await asyncio.to_thread(self._write_pdf, buffer, story)
+            filename = self._make_filename(user_id, doc_type, created)
+            data = buffer.getvalue()
+            self._cache_render(self._render_cache_key(doc_type, content, title, created), data)
+            logger.info("Документ создан в памяти по мере генерации: %s", filename)
+            
+            return content, filename, data
             
         except Exception as e:
-            logger.error(f"Ошибка при создании PDF документа: {e}")
+            logger.error(f"Ошибка при потоковом создании документа: {e}")
             return None
     
+    def _render_cache_key(
+        self,
+        doc_type: str,
+        content: str,
+        title: str,
+        created: datetime
+    ) -> bytes:
+        """
+        Ключ кэша готовых документов
+        
+        В ключ входит дата, напечатанная в документе, чтобы после полуночи
+        документ собирался заново.
+        
+        Args:
+            doc_type: Формат документа ('docx' или 'pdf')
+            content: Текстовое содержимое документа
+            title: Заголовок документа
+            created: Время создания документа
+        
+        Returns:
+            Хэш BLAKE2b от формата, заголовка, даты и содержимого
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (doc_type, title, created.strftime('%d.%m.%Y'), content):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.digest()
+    
+    def _get_cached_render(self, key: bytes) -> Optional[bytes]:
+        """
+        Получение готового документа из кэша
+        
+        Args:
+            key: Ключ кэша
+        
+        Returns:
+            Содержимое документа или None, если его нет в кэше
+        """
+        data = self._render_cache.get(key)
+        if data is not None:
+            self._render_cache.move_to_end(key)
+        return data
+    
+    def _cache_render(self, key: bytes, data: bytes):
+        """
+        Сохранение готового документа в кэш с вытеснением самого старого
+        
+        Args:
+            key: Ключ кэша
+            data: Содержимое документа
+        """
+        self._render_cache[key] = data
+        self._render_cache.move_to_end(key)
+        if len(self._render_cache) > _RENDER_CACHE_SIZE:
+            self._render_cache.popitem(last=False)
+    
     def _convert_markdown_to_html(self, text: str) -> str:
         """
         Конвертация markdown в HTML для ReportLab
@@ -450,15 +842,15 @@ class DocumentService:
             Текст с HTML тегами
         """
         # Жирный текст
-        text = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', text)
-        text = re.sub(r'__(.+?)__', r'<b>\1</b>', text)
+        text = _BOLD_STAR_RE.sub(r'<b>\1</b>', text)
+        text = _BOLD_UNDERSCORE_RE.sub(r'<b>\1</b>', text)
         
         # Курсив
-        text = re.sub(r'(?<!\w)\*(?!\*)(.+?)(?<!\*)\*(?!\w)', r'<i>\1</i>', text)
-        text = re.sub(r'(?<!\w)_(?!_)(.+?)(?<!_)_(?!\w)', r'<i>\1</i>', text)
+        text = _ITALIC_STAR_RE.sub(r'<i>\1</i>', text)
+        text = _ITALIC_UNDERSCORE_RE.sub(r'<i>\1</i>', text)
         
         # Код (моноширинный)
-        text = re.sub(r'`(.+?)`', r'<font name="Courier">\1</font>', text)
+        text = _CODE_RE.sub(r'<font name="Courier">\1</font>', text)
         
         return text
     
@@ -3,178 +3,170 @@
 Генерирует текстовый контент на основе запросов пользователя.
 """
 
+import asyncio
+import hashlib
 import logging
+import time
+from collections import OrderedDict
 import google.generativeai as genai
-from typing import Optional
+from google.generativeai import client as genai_client
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, Mapping, Optional, Tuple
+
+from telegram_doc_bot.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Ограничение одновременных запросов к API, общее для всех ключей:
+# при всплеске нагрузки лишние запросы ждут очереди, а не копят
+# в памяти промпты, ответы и HTTP-соединения. Создаётся при первом запросе:
+# до Python 3.10 семафор привязывается к циклу событий при создании
+_api_semaphore: Optional[asyncio.Semaphore] = None
 
-class GeminiService:
-    """Класс для взаимодействия с Google Gemini API"""
+# Кэш ответов на одинаковые промпты с одним API ключом: повторный запрос
+# возвращается без обращения к API и без расхода токенов. Ключ входит в ключ
+# кэша, чтобы ответ, оплаченный одним ключом, не доставался другому
+_RESPONSE_CACHE_SIZE = 1024
+_RESPONSE_CACHE_TTL = 1800  # секунд
+_response_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+# Запросы, которые уже выполняются, по ключу кэша: одинаковый промпт,
+# пришедший до завершения первого запроса, ждёт его результата
+_inflight: "Dict[str, asyncio.Future[Optional[str]]]" = {}
+
+
+def _get_api_semaphore() -> asyncio.Semaphore:
+    """
+    Семафор запросов к API в текущем цикле событий
     
-    def __init__(self, api_key: str):
-        """
-        Инициализация сервиса Gemini
-        
-        Args:
-            api_key: API ключ Google Gemini
-        """
-        self.api_key = api_key
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
-        logger.info("Gemini сервис инициализирован")
+    Returns:
+        Общий для всех ключей семафор
+    """
+    global _api_semaphore
+    if _api_semaphore is None:
+        _api_semaphore = asyncio.Semaphore(Config.GEMINI_MAX_CONCURRENCY)
+    return _api_semaphore
+
+
+def _prompt_key(prompt: str, api_key: str) -> str:
+    """
+    Ключ кэша ответов для промпта
     
-    async def generate_document_content(
-        self,
-        user_request: str,
-        template_type: str = 'custom'
-    ) -> Optional[str]:
-        """
-        Генерация содержимого документа на основе запроса пользователя
-        
-        Args:
-            user_request: Запрос пользователя с описанием документа
-            template_type: Тип шаблона документа
-        
-        Returns:
-            Сгенерированный текст документа или None в случае ошибки
-        """
-        try:
-            # Формирование промпта в зависимости от типа шаблона
-            prompt = self._create_prompt(user_request, template_type)
-            
-            logger.info(f"Генерация документа типа '{template_type}' для запроса: {user_request[:50]}...")
-            
-            # Генерация контента
-            response = await self._generate_async(prompt)
-            
-            if response:
-                logger.info(f"Документ успешно сгенерирован, длина: {len(response)} символов")
-                return response
-            else:
-                logger.error("Не удалось получить ответ от Gemini API")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Ошибка при генерации контента: {e}")
-            return None
+    Промпт не нормализуется: регистр (названия, аббревиатуры) и переносы
+    строк (текст документа в промпте правки) меняют ожидаемый ответ.
     
-    async def _generate_async(self, prompt: str) -> Optional[str]:
-        """
-        Асинхронная генерация текста через Gemini API
-        
-        Args:
-            prompt: Промпт для генерации
-        
-        Returns:
-            Сгенерированный текст или None
-        """
-        try:
-            # Используем синхронный метод в асинхронной обёртке
-            # так как библиотека google-generativeai не поддерживает async/await
-            response = self.model.generate_content(prompt)
-            
-            if response and response.text:
-                return response.text
-            return None
-            
-        except Exception as e:
-            logger.error(f"Ошибка API Gemini: {e}")
-            return None
+    Args:
+        prompt: Промпт для генерации
+        api_key: API ключ, которым оплачивается запрос
     
-    async def edit_document_content(
-        self,
-        original_content: str,
-        edit_instructions: str,
-        template_type: str = 'custom'
-    ) -> Optional[str]:
-        """
-        Редактирование содержимого документа на основе инструкций
-        
-        Args:
-            original_content: Исходное содержимое документа
-            edit_instructions: Инструкции по редактированию
-            template_type: Тип шаблона документа
-        
-        Returns:
-            Обновлённый текст документа или None в случае ошибки
-        """
-        try:
-            prompt = self._create_edit_prompt(original_content, edit_instructions, template_type)
-            
-            logger.info(f"Редактирование документа с инструкциями: {edit_instructions[:50]}...")
-            
-            response = await self._generate_async(prompt)
-            
-            if response:
-                logger.info(f"Документ успешно отредактирован, длина: {len(response)} символов")
-                return response
-            else:
-                logger.error("Не удалось получить ответ от Gemini API при редактировании")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Ошибка при редактировании контента: {e}")
-            return None
+    Returns:
+        SHA-256 ключа и промпта в шестнадцатеричном виде
+    """
+    digest = hashlib.sha256(api_key.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _get_cached_response(key: str) -> Optional[str]:
+    """
+    Получение ответа из кэша, если он ещё не устарел
     
-    def _create_edit_prompt(
-        self,
-        original_content: str,
-        edit_instructions: str,
-        template_type: str
-    ) -> str:
-        """
-        Создание промпта для редактирования документа
-        
-        Args:
-            original_content: Исходное содержимое
-            edit_instructions: Инструкции по редактированию
-            template_type: Тип шаблона документа
-        
-        Returns:
-            Сформированный промпт для редактирования
-        """
-        prompt = f"""
-Ты - профессиональный редактор документов. Текущий тип документа: {template_type}.
-У тебя есть существующий документ и инструкции по его изменению.
-
-ИСХОДНЫЙ ДОКУМЕНТ:
-```
-{original_content}
-```
+    Args:
+        key: Ключ кэша
+    
+    Returns:
+        Сохранённый текст или None
+    """
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    
+    text, stored_at = entry
+    if time.monotonic() - stored_at >= _RESPONSE_CACHE_TTL:
+        del _response_cache[key]
+        return None
+    
+    _response_cache.move_to_end(key)
+    return text
 
-ИНСТРУКЦИИ ПО РЕДАКТИРОВАНИЮ:
-{edit_instructions}
 
-ЗАДАЧА:
-Отредактируй документ согласно инструкциям. Сохрани общую структуру и стиль документа, внеся только необходимые изменения.
+def _cache_response(key: str, text: str):
+    """
+    Сохранение ответа в кэш с вытеснением самого старого
+    
+    Args:
+        key: Ключ кэша
+        text: Сгенерированный текст
+    """
+    _response_cache[key] = (text, time.monotonic())
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > _RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+async def _wait_inflight(key: str) -> Optional[str]:
+    """
+    Ожидание результата такого же запроса, если он уже выполняется
+    
+    Args:
+        key: Ключ кэша
+    
+    Returns:
+        Текст ответа или None, если такого запроса нет или он не удался
+    """
+    future = _inflight.get(key)
+    if future is None:
+        return None
+    
+    logger.info("Ожидание результата такого же запроса к Gemini")
+    # shield: отмена ожидающего не должна отменять общий результат
+    return await asyncio.shield(future)
 
-ВАЖНО:
-- Сохрани форматирование Markdown (##, ###, **, *, списки)
-- Не удаляй важные разделы, если это не указано в инструкциях
-- Сохрани профессиональный стиль и тон документа
-- Если инструкция требует добавить информацию - добавь её логично в структуру
-- Если инструкция требует удалить что-то - аккуратно удали, сохранив целостность документа
-- Если инструкция требует изменить стиль - примени изменения ко всему документу
 
-Верни полный отредактированный документ с применёнными изменениями.
-"""
-        return prompt
+def _begin_request(key: str) -> Optional["asyncio.Future[Optional[str]]"]:
+    """
+    Регистрация выполняемого запроса
     
-    def _create_prompt(self, user_request: str, template_type: str) -> str:
-        """
-        Создание промпта для Gemini на основе типа документа
-        
-        Args:
-            user_request: Запрос пользователя
-            template_type: Тип шаблона документа
-        
-        Returns:
-            Сформированный промпт
-        """
-        base_prompts = {
-            'contract': """
+    Args:
+        key: Ключ кэша
+    
+    Returns:
+        Future для результата или None, если запрос уже зарегистрирован
+    """
+    if key in _inflight:
+        return None
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    return future
+
+
+def _finish_request(
+    key: str,
+    future: Optional["asyncio.Future[Optional[str]]"],
+    text: Optional[str]
+):
+    """
+    Передача результата ожидающим и снятие запроса с регистрации
+    
+    Args:
+        key: Ключ кэша
+        future: Future, полученный от _begin_request
+        text: Текст ответа или None при ошибке
+    """
+    if future is None:
+        return
+    
+    if _inflight.get(key) is future:
+        del _inflight[key]
+    if not future.done():
+        future.set_result(text)
+
+
+# Шаблоны промптов по типу документа; {request} заменяется запросом пользователя
+_BASE_PROMPTS: Mapping[str, str] = MappingProxyType({
+    'contract': """
 Ты - профессиональный юрист. Создай юридически грамотный договор на основе следующего запроса:
 
 {request}
@@ -197,7 +189,7 @@ class GeminiService:
 - Используй нумерованные списки (1., 2., 3.) для пунктов
 - Используй маркированные списки (* или -) для перечислений
 """,
-            'statement': """
+    'statement': """
 Создай официальное заявление на основе следующего запроса:
 
 {request}
@@ -216,7 +208,7 @@ class GeminiService:
 - Используй **жирный текст** для выделения ключевых моментов
 - Структурируй текст с отступами и параграфами
 """,
-            'resume': """
+    'resume': """
 Создай профессиональное резюме на основе следующих данных:
 
 {request}
@@ -238,7 +230,7 @@ class GeminiService:
 - Используй **жирный текст** для должностей и ключевых достижений
 - Используй маркированные списки (*) для навыков и обязанностей
 """,
-            'letter': """
+    'letter': """
 Создай деловое письмо на основе следующего запроса:
 
 {request}
@@ -258,7 +250,7 @@ class GeminiService:
 - Структурируй текст с четкими параграфами
 - Используй списки при необходимости перечисления
 """,
-            'report': """
+    'report': """
 Создай структурированный отчёт на основе следующего запроса:
 
 {request}
@@ -279,7 +271,7 @@ class GeminiService:
 - Используй нумерованные списки для последовательных шагов
 - Используй маркированные списки для перечислений
 """,
-            'custom': """
+    'custom': """
 Создай документ на основе следующего запроса:
 
 {request}
@@ -295,7 +287,219 @@ class GeminiService:
 - Используй *курсив* для пояснений и примечаний
 - Используй списки (* или 1.) для структурирования информации
 """
-        }
+})
+
+# Шаблоны заранее разрезаны по месту запроса: промпт собирается
+# конкатенацией без разбора строки формата
+_PROMPT_PARTS: Mapping[str, Tuple[str, str]] = MappingProxyType({
+    template_type: tuple(template.split('{request}'))
+    for template_type, template in _BASE_PROMPTS.items()
+})
+
+
+class GeminiService:
+    """Класс для взаимодействия с Google Gemini API"""
+    
+    def __init__(self, api_key: str):
+        """
+        Инициализация сервиса Gemini
+        
+        Args:
+            api_key: API ключ Google Gemini
+        """
+        self.api_key = api_key
+        # Ключ кэша последнего запроса: точный повтор означает, что
+        # пользователь просит новый вариант, а не сохранённый ответ
+        self._last_key: Optional[str] = None
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel('gemini-pro')
+        # genai.configure меняет глобальный клиент, поэтому сразу привязываем
+        # модель к клиентам с ключом этого экземпляра: сервис переиспользуется
+        # между запросами, а другие пользователи могут сконфигурировать свой ключ
+        self.model._client = genai_client.get_default_generative_client()
+        self.model._async_client = genai_client.get_default_generative_async_client()
+        logger.info("Gemini сервис инициализирован")
+    
+    def _lookup_cache(self, key: str) -> Optional[str]:
+        """
+        Поиск ответа в кэше с учётом повторной генерации
+        
+        Args:
+            key: Ключ кэша
+        
+        Returns:
+            Сохранённый текст или None, если его нет или запрос повторный
+        """
+        repeated = key == self._last_key
+        self._last_key = key
+        if repeated:
+            logger.info("Повторный запрос: ответ Gemini генерируется заново")
+            return None
+        return _get_cached_response(key)
+    
+    async def stream_document_content(
+        self,
+        user_request: str,
+        template_type: str = 'custom'
+    ) -> AsyncIterator[str]:
+        """
+        Потоковая генерация содержимого документа
+        
+        Текст отдаётся фрагментами по мере ответа модели, чтобы документ
+        можно было собирать параллельно с генерацией.
         
-        prompt_template = base_prompts.get(template_type, base_prompts['custom'])
-        return prompt_template.format(request=user_request)
+        Args:
+            user_request: Запрос пользователя с описанием документа
+            template_type: Тип шаблона документа
+        
+        Yields:
+            Очередной фрагмент сгенерированного текста
+        """
+        prompt = self._create_prompt(user_request, template_type)
+        
+        logger.info(
+            f"Потоковая генерация документа типа '{template_type}' "
+            f"для запроса: {user_request[:50]}..."
+        )
+        
+        async for chunk in self._stream_async(prompt):
+            yield chunk
+    
+    async def _stream_async(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Потоковая генерация текста через Gemini API
+        
+        Ошибка пробрасывается дальше: оборванный поток не должен
+        превратиться в обрезанный документ.
+        
+        Args:
+            prompt: Промпт для генерации
+        
+        Yields:
+            Очередной фрагмент текста
+        """
+        key = _prompt_key(prompt, self.api_key)
+        cached = self._lookup_cache(key)
+        if cached is not None:
+            logger.info("Ответ Gemini взят из кэша")
+            yield cached
+            return
+        
+        # Ожидающий получает ответ целиком, как из кэша
+        shared = await _wait_inflight(key)
+        if shared is not None:
+            yield shared
+            return
+        
+        future = _begin_request(key)
+        text = None
+        parts = []
+        try:
+            # Слот семафора занят, пока поток не дочитан; таймаут действует
+            # на каждый фрагмент, чтобы не обрывать длинные документы
+            async with _get_api_semaphore():
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, stream=True), Config.GEMINI_TIMEOUT
+                )
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), Config.GEMINI_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+            # В кэш попадает только полностью полученный ответ
+            if parts:
+                text = ''.join(parts)
+                _cache_response(key, text)
+        except Exception as e:
+            logger.error(f"Ошибка API Gemini при потоковой генерации: {e}")
+            raise
+        finally:
+            _finish_request(key, future, text)
+    
+    async def stream_edited_content(
+        self,
+        original_content: str,
+        edit_instructions: str,
+        template_type: str = 'custom'
+    ) -> AsyncIterator[str]:
+        """
+        Потоковое редактирование содержимого документа
+        
+        Args:
+            original_content: Исходное содержимое документа
+            edit_instructions: Инструкции по редактированию
+            template_type: Тип шаблона документа
+        
+        Yields:
+            Очередной фрагмент обновлённого текста
+        """
+        prompt = self._create_edit_prompt(original_content, edit_instructions, template_type)
+        
+        logger.info(
+            f"Потоковое редактирование документа с инструкциями: {edit_instructions[:50]}..."
+        )
+        
+        async for chunk in self._stream_async(prompt):
+            yield chunk
+    
+    def _create_edit_prompt(
+        self,
+        original_content: str,
+        edit_instructions: str,
+        template_type: str
+    ) -> str:
+        """
+        Создание промпта для редактирования документа
+        
+        Args:
+            original_content: Исходное содержимое
+            edit_instructions: Инструкции по редактированию
+            template_type: Тип шаблона документа
+        
+        Returns:
+            Сформированный промпт для редактирования
+        """
+        prompt = f"""
+Ты - профессиональный редактор документов. Текущий тип документа: {template_type}.
+У тебя есть существующий документ и инструкции по его изменению.
+
+ИСХОДНЫЙ ДОКУМЕНТ:
+```
+{original_content}
+```
+
+ИНСТРУКЦИИ ПО РЕДАКТИРОВАНИЮ:
+{edit_instructions}
+
+ЗАДАЧА:
+Отредактируй документ согласно инструкциям. Сохрани общую структуру и стиль документа, внеся только необходимые изменения.
+
+ВАЖНО:
+- Сохрани форматирование Markdown (##, ###, **, *, списки)
+- Не удаляй важные разделы, если это не указано в инструкциях
+- Сохрани профессиональный стиль и тон документа
+- Если инструкция требует добавить информацию - добавь её логично в структуру
+- Если инструкция требует удалить что-то - аккуратно удали, сохранив целостность документа
+- Если инструкция требует изменить стиль - примени изменения ко всему документу
+
+Верни полный отредактированный документ с применёнными изменениями.
+"""
+        return prompt
+    
+    def _create_prompt(self, user_request: str, template_type: str) -> str:
+        """
+        Создание промпта для Gemini на основе типа документа
+        
+        Args:
+            user_request: Запрос пользователя
+            template_type: Тип шаблона документа
+        
+        Returns:
+            Сформированный промпт
+        """
+        prefix, suffix = _PROMPT_PARTS.get(template_type, _PROMPT_PARTS['custom'])
+        return prefix + user_request + suffix
@@ -7,7 +7,7 @@ from .keyboards import (
     get_cancel_keyboard
 )
 from .user_storage import UserStorage
-from .message_helpers import safe_edit_message, safe_delete_message
+from .message_helpers import safe_edit_message, safe_delete_message, answer_with_keyboard
 
 __all__ = [
     'get_main_keyboard',
@@ -16,5 +16,6 @@ __all__ = [
     'get_cancel_keyboard',
     'UserStorage',
     'safe_edit_message',
-    'safe_delete_message'
+    'safe_delete_message',
+    'answer_with_keyboard'
 ]
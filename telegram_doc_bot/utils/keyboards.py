@@ -2,6 +2,8 @@
 Модуль для создания клавиатур Telegram бота
 """
 
+from functools import lru_cache
+
 from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
@@ -11,13 +13,8 @@ from aiogram.types import (
 from telegram_doc_bot.config import Config
 
 
-def get_main_keyboard() -> ReplyKeyboardMarkup:
-    """
-    Создание главной клавиатуры бота
-    
-    Returns:
-        Клавиатура с основными командами
-    """
+def _build_main_keyboard() -> ReplyKeyboardMarkup:
+    """Построение главной клавиатуры бота"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📝 Создать документ"), KeyboardButton(text="📚 История")],
@@ -31,13 +28,22 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     return keyboard
 
 
-def get_template_keyboard() -> InlineKeyboardMarkup:
+# Клавиатуры неизменяемы (frozen pydantic-модели), поэтому строятся один раз
+_MAIN_KB = _build_main_keyboard()
+
+
+def get_main_keyboard() -> ReplyKeyboardMarkup:
     """
-    Создание клавиатуры для выбора шаблона документа
+    Получение главной клавиатуры бота
     
     Returns:
-        Inline клавиатура с шаблонами
+        Клавиатура с основными командами
     """
+    return _MAIN_KB
+
+
+def _build_template_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры для выбора шаблона документа"""
     buttons = []
     row = []
     for i, (key, value) in enumerate(Config.DOCUMENT_TEMPLATES.items()):
@@ -53,13 +59,21 @@ def get_template_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_document_type_keyboard() -> InlineKeyboardMarkup:
+_TEMPLATE_KB = _build_template_keyboard()
+
+
+def get_template_keyboard() -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры для выбора типа документа (Word/PDF)
+    Получение клавиатуры для выбора шаблона документа
     
     Returns:
-        Inline клавиатура с типами документов
+        Inline клавиатура с шаблонами
     """
+    return _TEMPLATE_KB
+
+
+def _build_document_type_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры для выбора типа документа (Word/PDF)"""
     buttons = []
     for key, value in Config.DOCUMENT_TYPES.items():
         buttons.append([InlineKeyboardButton(
@@ -71,13 +85,21 @@ def get_document_type_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_cancel_keyboard() -> ReplyKeyboardMarkup:
+_DOCUMENT_TYPE_KB = _build_document_type_keyboard()
+
+
+def get_document_type_keyboard() -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры с кнопкой отмены
+    Получение клавиатуры для выбора типа документа (Word/PDF)
     
     Returns:
-        Клавиатура с кнопкой "Отмена"
+        Inline клавиатура с типами документов
     """
+    return _DOCUMENT_TYPE_KB
+
+
+def _build_cancel_keyboard() -> ReplyKeyboardMarkup:
+    """Построение клавиатуры с кнопкой отмены"""
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="❌ Отмена")]
@@ -87,13 +109,21 @@ def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     return keyboard
 
 
-def get_document_actions_keyboard() -> InlineKeyboardMarkup:
+_CANCEL_KB = _build_cancel_keyboard()
+
+
+def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     """
-    Создание клавиатуры с действиями для документа после генерации
+    Получение клавиатуры с кнопкой отмены
     
     Returns:
-        Inline клавиатура с действиями (редактировать, создать новый, завершить)
+        Клавиатура с кнопкой "Отмена"
     """
+    return _CANCEL_KB
+
+
+def _build_document_actions_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры с действиями для документа после генерации"""
     buttons = [
         [
             InlineKeyboardButton(
@@ -131,16 +161,21 @@ def get_document_actions_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_api_key_management_keyboard(has_key: bool = False) -> InlineKeyboardMarkup:
+_DOCUMENT_ACTIONS_KB = _build_document_actions_keyboard()
+
+
+def get_document_actions_keyboard() -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры для управления API ключом
-    
-    Args:
-        has_key: Есть ли у пользователя сохранённый ключ
+    Получение клавиатуры с действиями для документа после генерации
     
     Returns:
-        Inline клавиатура с действиями для управления API ключом
+        Inline клавиатура с действиями (редактировать, создать новый, завершить)
     """
+    return _DOCUMENT_ACTIONS_KB
+
+
+def _build_api_key_management_keyboard(has_key: bool) -> InlineKeyboardMarkup:
+    """Построение клавиатуры для управления API ключом"""
     buttons = []
     
     if has_key:
@@ -167,13 +202,27 @@ def get_api_key_management_keyboard(has_key: bool = False) -> InlineKeyboardMark
     return keyboard
 
 
-def get_api_key_confirm_keyboard() -> InlineKeyboardMarkup:
+_API_KEY_MANAGEMENT_KB = {
+    has_key: _build_api_key_management_keyboard(has_key)
+    for has_key in (False, True)
+}
+
+
+def get_api_key_management_keyboard(has_key: bool = False) -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры для подтверждения удаления API ключа
+    Получение клавиатуры для управления API ключом
+    
+    Args:
+        has_key: Есть ли у пользователя сохранённый ключ
     
     Returns:
-        Inline клавиатура с кнопками подтверждения
+        Inline клавиатура с действиями для управления API ключом
     """
+    return _API_KEY_MANAGEMENT_KB[bool(has_key)]
+
+
+def _build_api_key_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры для подтверждения удаления API ключа"""
     buttons = [
         [
             InlineKeyboardButton(
@@ -191,13 +240,21 @@ def get_api_key_confirm_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_language_keyboard() -> InlineKeyboardMarkup:
+_API_KEY_CONFIRM_KB = _build_api_key_confirm_keyboard()
+
+
+def get_api_key_confirm_keyboard() -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры для выбора языка документа
+    Получение клавиатуры для подтверждения удаления API ключа
     
     Returns:
-        Inline клавиатура с языками
+        Inline клавиатура с кнопками подтверждения
     """
+    return _API_KEY_CONFIRM_KB
+
+
+def _build_language_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры для выбора языка документа"""
     buttons = []
     row = []
     for i, (key, value) in enumerate(Config.DOCUMENT_LANGUAGES.items()):
@@ -218,13 +275,21 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_style_keyboard() -> InlineKeyboardMarkup:
+_LANGUAGE_KB = _build_language_keyboard()
+
+
+def get_language_keyboard() -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры для выбора стиля документа
+    Получение клавиатуры для выбора языка документа
     
     Returns:
-        Inline клавиатура со стилями
+        Inline клавиатура с языками
     """
+    return _LANGUAGE_KB
+
+
+def _build_style_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры для выбора стиля документа"""
     buttons = []
     for key, value in Config.DOCUMENT_STYLES.items():
         buttons.append([InlineKeyboardButton(
@@ -241,13 +306,21 @@ def get_style_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_settings_keyboard() -> InlineKeyboardMarkup:
+_STYLE_KB = _build_style_keyboard()
+
+
+def get_style_keyboard() -> InlineKeyboardMarkup:
     """
-    Создание клавиатуры настроек
+    Получение клавиатуры для выбора стиля документа
     
     Returns:
-        Inline клавиатура с настройками
+        Inline клавиатура со стилями
     """
+    return _STYLE_KB
+
+
+def _build_settings_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры настроек"""
     buttons = [
         [InlineKeyboardButton(
             text="🌍 Язык документа",
@@ -271,10 +344,27 @@ def get_settings_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+_SETTINGS_KB = _build_settings_keyboard()
+
+
+def get_settings_keyboard() -> InlineKeyboardMarkup:
+    """
+    Получение клавиатуры настроек
+    
+    Returns:
+        Inline клавиатура с настройками
+    """
+    return _SETTINGS_KB
+
+
+@lru_cache(maxsize=4096)
 def get_history_item_keyboard(doc_id: int) -> InlineKeyboardMarkup:
     """
     Создание клавиатуры для элемента истории
     
+    Разметка неизменяема, поэтому клавиатура для одного и того же
+    документа создаётся один раз и переиспользуется.
+    
     Args:
         doc_id: ID документа
     
@@ -308,6 +398,7 @@ def get_history_item_keyboard(doc_id: int) -> InlineKeyboardMarkup:
     return keyboard
 
 
+@lru_cache(maxsize=16)
 def get_variants_keyboard(count: int = 3) -> InlineKeyboardMarkup:
     """
     Создание клавиатуры для выбора варианта документа
@@ -334,13 +425,8 @@ def get_variants_keyboard(count: int = 3) -> InlineKeyboardMarkup:
     return keyboard
 
 
-def get_preview_keyboard() -> InlineKeyboardMarkup:
-    """
-    Создание клавиатуры для предпросмотра документа
-    
-    Returns:
-        Inline клавиатура с действиями предпросмотра
-    """
+def _build_preview_keyboard() -> InlineKeyboardMarkup:
+    """Построение клавиатуры для предпросмотра документа"""
     buttons = [
         [
             InlineKeyboardButton(
@@ -368,3 +454,16 @@ def get_preview_keyboard() -> InlineKeyboardMarkup:
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
     return keyboard
+
+
+_PREVIEW_KB = _build_preview_keyboard()
+
+
+def get_preview_keyboard() -> InlineKeyboardMarkup:
+    """
+    Получение клавиатуры для предпросмотра документа
+    
+    Returns:
+        Inline клавиатура с действиями предпросмотра
+    """
+    return _PREVIEW_KB
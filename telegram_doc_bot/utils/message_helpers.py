@@ -2,20 +2,120 @@
 Helper functions for safe message operations
 """
 
+import asyncio
 import logging
-from typing import Optional
+import random
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+from aiogram.client.default import Default
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InlineKeyboardMarkup
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from telegram_doc_bot.utils.keyboards import get_main_keyboard, get_cancel_keyboard
 
 logger = logging.getLogger(__name__)
 
+# Reply keyboards tracked by answer_with_keyboard, by name
+_REPLY_KEYBOARDS = {
+    "main": get_main_keyboard(),
+    "cancel": get_cancel_keyboard(),
+}
+
+# FSM data key holding the name of the reply keyboard the user currently has
+_LAST_KB_KEY = "last_kb"
+
+# Known edit failures; group 1 tells which one occurred
+_EDIT_ERR_RE = re.compile(
+    r"message (is not modified|can'?t be edited|to edit not found)",
+    re.IGNORECASE
+)
+
+# Debug notes for failures after which a new message is sent instead
+_RESEND_REASONS = {
+    "can't be edited": "Message can't be edited (too old or deleted)",
+    "cant be edited": "Message can't be edited (too old or deleted)",
+    "to edit not found": "Message was deleted or not found",
+}
+
+# Fingerprints of the last content set by safe_edit_message, by
+# (chat_id, message_id); an identical edit is skipped without an API call
+_EDIT_CACHE_SIZE = 10000
+_last_edits: "OrderedDict[Tuple[int, int], int]" = OrderedDict()
+
+# Flood control: attempts per edit, longest wait worth retrying (seconds)
+# and random jitter added to Telegram's retry_after
+_EDIT_MAX_ATTEMPTS = 3
+_MAX_RETRY_AFTER = 10
+_RETRY_JITTER = 0.5
+
+
+def _edit_fingerprint(
+    text: str,
+    parse_mode: Optional[Union[str, Default]],
+    reply_markup: Optional[InlineKeyboardMarkup]
+) -> int:
+    """Hash of everything an edit sets on the message."""
+    # An explicit None means plain text, unlike the bot-wide default mode
+    if isinstance(parse_mode, Default):
+        parse_mode = "default"
+    return hash((
+        text,
+        parse_mode,
+        reply_markup.model_dump_json() if reply_markup else None,
+    ))
+
+
+def _remember_edit(key: Tuple[int, int], fingerprint: int):
+    """Store the fingerprint of a message's current content."""
+    _last_edits[key] = fingerprint
+    _last_edits.move_to_end(key)
+    if len(_last_edits) > _EDIT_CACHE_SIZE:
+        _last_edits.popitem(last=False)
+
+
+async def _send_new(
+    message: Message,
+    text: str,
+    parse_mode: Optional[Union[str, Default]],
+    reply_markup: Optional[InlineKeyboardMarkup]
+) -> Optional[Message]:
+    """
+    Send the text as a new message when the original can't be edited.
+    
+    Args:
+        message: The message that failed to be edited
+        text: Text for the new message
+        parse_mode: Parse mode for the new message
+        reply_markup: Reply markup for the new message
+        
+    Returns:
+        The new message, None if sending failed
+    """
+    try:
+        sent = await message.answer(
+            text=text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup
+        )
+    except Exception as e:
+        logger.error(f"Failed to send new message: {e}")
+        return None
+    
+    _remember_edit(
+        (sent.chat.id, sent.message_id),
+        _edit_fingerprint(text, parse_mode, reply_markup)
+    )
+    return sent
+
 
 async def safe_edit_message(
     message: Message,
     text: str,
-    parse_mode: Optional[str] = None,
+    parse_mode: Optional[Union[str, Default]] = Default("parse_mode"),
     reply_markup: Optional[InlineKeyboardMarkup] = None,
-    send_new_on_fail: bool = False
+    send_new_on_fail: bool = True
 ) -> Optional[Message]:
     """
     Safely edit a message with error handling for TelegramBadRequest.
@@ -23,57 +123,60 @@ async def safe_edit_message(
     Args:
         message: The message to edit
         text: New text for the message
-        parse_mode: Parse mode (HTML, Markdown, etc.)
+        parse_mode: Parse mode (HTML, Markdown, etc.); defaults to the bot-wide setting
         reply_markup: New reply markup (can be None to remove)
-        send_new_on_fail: If True, send a new message if editing fails
+        send_new_on_fail: If True (default), send a new message if editing fails
         
     Returns:
         The edited message or new message if sent, None if operation failed
     """
-    try:
-        return await message.edit_text(
-            text=text,
-            parse_mode=parse_mode,
-            reply_markup=reply_markup
-        )
-    except TelegramBadRequest as e:
-        error_msg = str(e)
-        logger.warning(f"Failed to edit message: {error_msg}")
-        
-        if "message is not modified" in error_msg.lower():
-            logger.debug("Message content is identical to current content, skipping edit")
-            return message
-        elif "message can't be edited" in error_msg.lower():
-            logger.debug("Message can't be edited (too old or deleted)")
-            if send_new_on_fail:
-                try:
-                    return await message.answer(
-                        text=text,
-                        parse_mode=parse_mode,
-                        reply_markup=reply_markup
-                    )
-                except Exception as new_msg_error:
-                    logger.error(f"Failed to send new message: {new_msg_error}")
-                    return None
-        elif "message to edit not found" in error_msg.lower():
-            logger.debug("Message was deleted or not found")
-            if send_new_on_fail:
-                try:
-                    return await message.answer(
-                        text=text,
-                        parse_mode=parse_mode,
-                        reply_markup=reply_markup
-                    )
-                except Exception as new_msg_error:
-                    logger.error(f"Failed to send new message: {new_msg_error}")
-                    return None
-        else:
-            logger.error(f"Unexpected TelegramBadRequest: {error_msg}")
+    key = (message.chat.id, message.message_id)
+    fingerprint = _edit_fingerprint(text, parse_mode, reply_markup)
+    if _last_edits.get(key) == fingerprint:
+        logger.debug("Message content is unchanged since the last edit, skipping edit")
+        return message
+    
+    for attempt in range(1, _EDIT_MAX_ATTEMPTS + 1):
+        try:
+            edited = await message.edit_text(
+                text=text,
+                parse_mode=parse_mode,
+                reply_markup=reply_markup
+            )
+            _remember_edit(key, fingerprint)
+            return edited
+        except TelegramRetryAfter as e:
+            if attempt == _EDIT_MAX_ATTEMPTS or e.retry_after > _MAX_RETRY_AFTER:
+                logger.error(f"Flood control on edit, giving up: retry after {e.retry_after}s")
+                return None
+            logger.warning(f"Flood control on edit, retrying in {e.retry_after}s")
+            await asyncio.sleep(e.retry_after + random.uniform(0, _RETRY_JITTER))
+        except TelegramForbiddenError as e:
+            # The bot was blocked or removed from the chat: a new message would fail too
+            logger.warning(f"Can't edit message, no access to the chat: {e}")
+            return None
+        except TelegramBadRequest as e:
+            error_msg = str(e)
+            logger.warning(f"Failed to edit message: {error_msg}")
             
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error while editing message: {e}")
-        return None
+            match = _EDIT_ERR_RE.search(error_msg)
+            reason = match.group(1).lower() if match else None
+            
+            if reason == "is not modified":
+                logger.debug("Message content is identical to current content, skipping edit")
+                _remember_edit(key, fingerprint)
+                return message
+            elif reason in _RESEND_REASONS:
+                logger.debug(_RESEND_REASONS[reason])
+                if send_new_on_fail:
+                    return await _send_new(message, text, parse_mode, reply_markup)
+            else:
+                logger.error(f"Unexpected TelegramBadRequest: {error_msg}")
+                
+            return None
+        except Exception as e:
+            logger.error(f"Unexpected error while editing message: {e}")
+            return None
 
 
 async def safe_delete_message(message: Message) -> bool:
@@ -88,6 +191,7 @@ async def safe_delete_message(message: Message) -> bool:
     """
     try:
         await message.delete()
+        _last_edits.pop((message.chat.id, message.message_id), None)
         return True
     except TelegramBadRequest as e:
         logger.warning(f"Failed to delete message: {e}")
@@ -95,3 +199,42 @@ async def safe_delete_message(message: Message) -> bool:
     except Exception as e:
         logger.error(f"Unexpected error while deleting message: {e}")
         return False
+
+
+async def answer_with_keyboard(
+    message: Message,
+    text: str,
+    state: FSMContext,
+    keyboard: str = "main",
+    data: Optional[Dict[str, Any]] = None,
+    **kwargs: Any
+) -> Message:
+    """
+    Answer with a reply keyboard, attaching it only when it changes.
+    
+    A reply keyboard stays on the client until it is replaced, so the
+    name of the last one sent is kept in FSM data and the markup is
+    omitted when the same keyboard is requested again. Clearing the
+    state simply makes the next answer send the keyboard again.
+    
+    Args:
+        message: Message whose chat receives the answer
+        text: Text of the answer
+        state: FSM context of the user
+        keyboard: Reply keyboard name ("main" or "cancel")
+        data: FSM data already read by the handler; updated in place
+        **kwargs: Extra arguments for message.answer
+        
+    Returns:
+        The sent message
+    """
+    if data is None:
+        data = await state.get_data()
+    
+    if data.get(_LAST_KB_KEY) == keyboard:
+        return await message.answer(text, **kwargs)
+    
+    sent = await message.answer(text, reply_markup=_REPLY_KEYBOARDS[keyboard], **kwargs)
+    data[_LAST_KB_KEY] = keyboard
+    await state.update_data({_LAST_KB_KEY: keyboard})
+    return sent
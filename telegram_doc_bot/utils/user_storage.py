@@ -2,17 +2,122 @@
 Модуль для хранения пользовательских данных (API ключи)
 """
 
+import asyncio
 import logging
 import sqlite3
-from typing import Optional
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Any, Final, Iterator, Optional
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Запросы к базе данных. Текст каждого запроса задан один раз: так его проще
+# проверять, а кэш подготовленных запросов соединения находит его по тексту
+
+# Пользователи и API ключи
+_SQL_UPSERT_API_KEY: Final = """
+    INSERT INTO users (user_id, gemini_api_key)
+    VALUES (?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        gemini_api_key = excluded.gemini_api_key,
+        updated_at = CURRENT_TIMESTAMP
+"""
+_SQL_GET_API_KEY: Final = "SELECT gemini_api_key FROM users WHERE user_id = ?"
+_SQL_HAS_API_KEY: Final = """
+    SELECT 1 FROM users
+    WHERE user_id = ? AND gemini_api_key IS NOT NULL AND gemini_api_key != ''
+"""
+_SQL_DELETE_API_KEY: Final = """
+    UPDATE users SET gemini_api_key = NULL, updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = ?
+"""
+
+# История документов; один текст вставки позволяет объединять
+# отложенные вставки в executemany
+_SQL_INSERT_HISTORY: Final = """
+    INSERT INTO document_history
+    (user_id, template_name, template_type, doc_type, content, user_request)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_SQL_GET_HISTORY: Final = """
+    SELECT * FROM document_history
+    WHERE user_id = ?
+    ORDER BY date DESC
+    LIMIT 20
+"""
+_SQL_CLEAR_HISTORY: Final = "DELETE FROM document_history WHERE user_id = ?"
+
+# Избранное
+_SQL_INSERT_FAVORITE: Final = """
+    INSERT INTO favorites
+    (user_id, template_name, template_type, doc_type, content, user_request)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_SQL_GET_FAVORITES: Final = """
+    SELECT * FROM favorites
+    WHERE user_id = ?
+    ORDER BY date DESC
+"""
+
+# Настройки
+_SQL_GET_SETTINGS: Final = "SELECT * FROM user_settings WHERE user_id = ?"
+_SQL_INSERT_SETTINGS: Final = "INSERT INTO user_settings (user_id) VALUES (?)"
+
+# Статистика
+_SQL_GET_STATISTICS: Final = "SELECT * FROM statistics WHERE user_id = ?"
+_SQL_COUNT_DOCUMENT: Final = """
+    INSERT INTO statistics (user_id, total_documents, total_words, favorite_template, last_used)
+    VALUES (?, 1, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_documents = total_documents + 1,
+        total_words = total_words + ?,
+        favorite_template = ?,
+        last_used = CURRENT_TIMESTAMP
+"""
+_SQL_COUNT_EDIT: Final = """
+    INSERT INTO statistics (user_id, total_edits, last_used)
+    VALUES (?, 1, CURRENT_TIMESTAMP)
+    ON CONFLICT(user_id) DO UPDATE SET
+        total_edits = total_edits + 1,
+        last_used = CURRENT_TIMESTAMP
+"""
+
 
 class UserStorage:
     """Класс для работы с хранилищем пользовательских данных"""
     
+    # Максимальное число пользователей в каждом разделе кэша чтения
+    CACHE_MAX_USERS = 1024
+    
+    # Максимальное число простаивающих соединений для чтения
+    READ_POOL_SIZE = 4
+    
+    # Отложенная запись истории и статистики: изменения копятся в памяти
+    # и записываются одной транзакцией по заполнении пакета или по таймеру
+    FLUSH_BATCH_SIZE = 100
+    FLUSH_INTERVAL = 1.0  # секунд
+    # Сколько раз подряд повторять неудачную запись пакета, прежде чем его отбросить
+    FLUSH_MAX_RETRIES = 3
+    
+    # Настройки, которые можно менять через update_setting
+    ALLOWED_SETTING_KEYS = frozenset({'language', 'style', 'notifications'})
+    
+    # Запрос обновления для каждой настройки: имя столбца не подставляется
+    # в SQL при вызове, а текст запроса постоянен и берётся из кэша
+    # подготовленных запросов соединения
+    _SETTING_STATEMENTS = {
+        key: f"""
+            INSERT INTO user_settings (user_id, {key})
+            VALUES (?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET {key} = excluded.{key}
+        """
+        for key in ALLOWED_SETTING_KEYS
+    }
+    
     def __init__(self, db_path: str = "user_data.db"):
         """
         Инициализация хранилища
@@ -21,12 +126,159 @@ class UserStorage:
             db_path: Путь к файлу базы данных
         """
         self.db_path = db_path
+        # Кэш чтения: раздел ('history', 'settings', ...) -> user_id -> данные.
+        # Запись в БД сбрасывает соответствующую запись кэша.
+        self._cache: dict[str, OrderedDict[int, Any]] = {}
+        # Счётчик записей по разделам: результат чтения, во время которого
+        # в раздел что-то записали, может быть устаревшим и в кэш не попадает
+        self._generations: dict[str, int] = {}
+        # Соединения живут всё время работы бота: много читателей
+        # и один писатель, как и допускает SQLite в режиме WAL
+        self._read_pool: list[sqlite3.Connection] = []
+        self._read_lock = threading.Lock()
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        # Очередь отложенных записей: (SQL, параметры)
+        self._pending: list[tuple[str, tuple]] = []
+        self._batch_full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_failures = 0
         self._init_database()
     
+    def _cache_get(self, section: str, user_id: int) -> Optional[Any]:
+        """Получение данных пользователя из кэша"""
+        entries = self._cache.get(section)
+        if entries is None or user_id not in entries:
+            return None
+        entries.move_to_end(user_id)
+        return entries[user_id]
+    
+    def _generation(self, section: str) -> int:
+        """Текущий счётчик записей раздела кэша"""
+        return self._generations.get(section, 0)
+    
+    def _cache_set(self, section: str, user_id: int, value: Any, generation: Optional[int] = None):
+        """
+        Сохранение данных пользователя в кэш с вытеснением самых старых записей
+        
+        Args:
+            section: Раздел кэша
+            user_id: ID пользователя в Telegram
+            value: Данные
+            generation: Счётчик раздела на момент начала чтения из БД
+        """
+        if generation is not None and generation != self._generation(section):
+            return
+        entries = self._cache.setdefault(section, OrderedDict())
+        entries[user_id] = value
+        entries.move_to_end(user_id)
+        if len(entries) > self.CACHE_MAX_USERS:
+            entries.popitem(last=False)
+    
+    def _invalidate(self, section: str, user_id: int):
+        """Сброс данных пользователя в кэше"""
+        self._generations[section] = self._generation(section) + 1
+        entries = self._cache.get(section)
+        if entries is not None:
+            entries.pop(user_id, None)
+    
+    @staticmethod
+    def _configure(conn: sqlite3.Connection):
+        """
+        Настройка соединения с базой данных
+        
+        Эти параметры действуют только на текущее соединение, поэтому
+        применяются при каждом подключении. Режим журнала WAL хранится
+        в самом файле и включается один раз в _init_database.
+        
+        Args:
+            conn: Соединение с базой данных
+        """
+        # В режиме WAL достаточно NORMAL: fsync выполняется при контрольной
+        # точке, а не при каждом коммите, и данные не повреждаются при сбое
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие настроенного соединения с базой данных"""
+        # Соединение может перейти в другой поток; доступ к нему
+        # защищён блокировками пула
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._configure(conn)
+        return conn
+    
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Соединение для чтения из пула
+        
+        Пул работает как стек: чаще используется последнее возвращённое
+        соединение, у которого кэш страниц уже прогрет.
+        
+        Yields:
+            Соединение только для чтения со строками sqlite3.Row
+        """
+        with self._read_lock:
+            conn = self._read_pool.pop() if self._read_pool else None
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only=1")
+            conn.row_factory = sqlite3.Row
+        
+        try:
+            yield conn
+        finally:
+            with self._read_lock:
+                if len(self._read_pool) < self.READ_POOL_SIZE:
+                    self._read_pool.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+    
+    @contextmanager
+    def _writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Единственное соединение для записи
+        
+        Транзакция фиксируется при выходе из блока и откатывается
+        при исключении.
+        
+        Yields:
+            Соединение для записи
+        """
+        with self._write_lock:
+            if self._write_conn is None:
+                self._write_conn = self._connect()
+            with self._write_conn as conn:
+                yield conn
+    
+    async def close(self):
+        """Запись отложенных изменений и закрытие всех соединений с базой данных"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        while self._pending:
+            await self.flush()
+        
+        with self._read_lock:
+            pool, self._read_pool = self._read_pool, []
+        for conn in pool:
+            conn.close()
+        
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+    
     def _init_database(self):
         """Инициализация базы данных и создание таблиц"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._writer() as conn:
+                # Читатели не блокируются писателем и не блокируют его
+                conn.execute("PRAGMA journal_mode=WAL")
                 cursor = conn.cursor()
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS users (
@@ -65,6 +317,17 @@ class UserStorage:
                     )
                 """)
                 
+                # История и избранное читаются по пользователю от новых
+                # к старым: индекс покрывает и фильтр, и сортировку
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_history_user_date
+                    ON document_history(user_id, date DESC)
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_fav_user_date
+                    ON favorites(user_id, date DESC)
+                """)
+                
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS user_settings (
                         user_id INTEGER PRIMARY KEY,
@@ -92,7 +355,102 @@ class UserStorage:
         except Exception as e:
             logger.error(f"Ошибка при инициализации базы данных: {e}")
     
-    def set_api_key(self, user_id: int, api_key: str) -> bool:
+    def _fetch_one(self, sql: str, params: tuple) -> Optional[sqlite3.Row]:
+        """Выполнение запроса на чтение и получение первой строки"""
+        with self._reader() as conn:
+            return conn.execute(sql, params).fetchone()
+    
+    def _fetch_all(self, sql: str, params: tuple) -> list:
+        """Выполнение запроса на чтение и получение всех строк в виде словарей"""
+        with self._reader() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+    
+    def _execute(self, sql: str, params: tuple) -> int:
+        """
+        Выполнение запроса на запись
+        
+        Returns:
+            Число изменённых строк
+        """
+        with self._writer() as conn:
+            return conn.execute(sql, params).rowcount
+    
+    def _execute_batch(self, batch: list):
+        """
+        Выполнение пакета запросов на запись в одной транзакции
+        
+        Подряд идущие одинаковые запросы выполняются одним executemany.
+        
+        Args:
+            batch: Список пар (SQL, параметры)
+        """
+        with self._writer() as conn:
+            for sql, group in groupby(batch, key=lambda item: item[0]):
+                conn.executemany(sql, [params for _, params in group])
+    
+    def _defer_write(self, sql: str, params: tuple, section: str, user_id: int):
+        """
+        Постановка записи в очередь отложенных изменений
+        
+        Args:
+            sql: Запрос на запись
+            params: Параметры запроса
+            section: Раздел кэша, который затрагивает запись
+            user_id: ID пользователя в Telegram
+        """
+        self._pending.append((sql, params))
+        self._invalidate(section, user_id)
+        if len(self._pending) >= self.FLUSH_BATCH_SIZE:
+            self._batch_full.set()
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self):
+        """Фоновая запись очереди по заполнении пакета или по таймеру"""
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_full.clear()
+            await self.flush()
+    
+    async def flush(self) -> bool:
+        """
+        Запись всех отложенных изменений в базу данных
+        
+        При ошибке пакет возвращается в начало очереди и записывается
+        при следующем сбросе; после FLUSH_MAX_RETRIES неудач подряд
+        он отбрасывается.
+        
+        Returns:
+            True, если очередь записана (или была пуста)
+        """
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return True
+            try:
+                await asyncio.to_thread(self._execute_batch, batch)
+            except Exception as e:
+                self._flush_failures += 1
+                if self._flush_failures < self.FLUSH_MAX_RETRIES:
+                    logger.warning(
+                        f"Ошибка при записи отложенных изменений ({len(batch)} шт.), "
+                        f"попытка {self._flush_failures}: {e}"
+                    )
+                    self._pending[:0] = batch
+                else:
+                    logger.error(
+                        f"Отложенные изменения потеряны ({len(batch)} шт.) "
+                        f"после {self._flush_failures} попыток: {e}"
+                    )
+                    self._flush_failures = 0
+                return False
+            self._flush_failures = 0
+            return True
+    
+    async def set_api_key(self, user_id: int, api_key: str) -> bool:
         """
         Сохранение API ключа пользователя
         
@@ -104,23 +462,17 @@ class UserStorage:
             True если сохранение успешно, False в случае ошибки
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO users (user_id, gemini_api_key)
-                    VALUES (?, ?)
-                    ON CONFLICT(user_id) DO UPDATE SET
-                        gemini_api_key = excluded.gemini_api_key,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (user_id, api_key))
-                conn.commit()
-                logger.info(f"API ключ сохранён для пользователя {user_id}")
-                return True
+            await asyncio.to_thread(self._execute, _SQL_UPSERT_API_KEY, (user_id, api_key))
+            self._invalidate('api_key', user_id)
+            self._invalidate('has_api_key', user_id)
+            self._cache_set('api_key', user_id, api_key)
+            logger.info(f"API ключ сохранён для пользователя {user_id}")
+            return True
         except Exception as e:
             logger.error(f"Ошибка при сохранении API ключа: {e}")
             return False
     
-    def get_api_key(self, user_id: int) -> Optional[str]:
+    async def get_api_key(self, user_id: int) -> Optional[str]:
         """
         Получение API ключа пользователя
         
@@ -130,19 +482,21 @@ class UserStorage:
         Returns:
             API ключ или None если не найден
         """
+        # Отсутствие ключа кэшируется пустой строкой
+        cached = self._cache_get('api_key', user_id)
+        if cached is not None:
+            return cached or None
+        generation = self._generation('api_key')
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT gemini_api_key FROM users WHERE user_id = ?
-                """, (user_id,))
-                result = cursor.fetchone()
-                return result[0] if result and result[0] else None
+            result = await asyncio.to_thread(self._fetch_one, _SQL_GET_API_KEY, (user_id,))
+            api_key = result[0] if result and result[0] else None
+            self._cache_set('api_key', user_id, api_key or '', generation)
+            return api_key
         except Exception as e:
             logger.error(f"Ошибка при получении API ключа: {e}")
             return None
     
-    def delete_api_key(self, user_id: int) -> bool:
+    async def delete_api_key(self, user_id: int) -> bool:
         """
         Удаление API ключа пользователя
         
@@ -153,20 +507,17 @@ class UserStorage:
             True если удаление успешно, False в случае ошибки
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE users SET gemini_api_key = NULL, updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ?
-                """, (user_id,))
-                conn.commit()
-                logger.info(f"API ключ удалён для пользователя {user_id}")
-                return True
+            await asyncio.to_thread(self._execute, _SQL_DELETE_API_KEY, (user_id,))
+            self._invalidate('api_key', user_id)
+            self._invalidate('has_api_key', user_id)
+            self._cache_set('api_key', user_id, '')
+            logger.info(f"API ключ удалён для пользователя {user_id}")
+            return True
         except Exception as e:
             logger.error(f"Ошибка при удалении API ключа: {e}")
             return False
     
-    def has_api_key(self, user_id: int) -> bool:
+    async def has_api_key(self, user_id: int) -> bool:
         """
         Проверка наличия API ключа у пользователя
         
@@ -176,158 +527,159 @@ class UserStorage:
         Returns:
             True если ключ есть, False если нет
         """
-        api_key = self.get_api_key(user_id)
-        return api_key is not None and len(api_key) > 0
-    
-    def add_to_history(self, user_id: int, doc_data: dict) -> bool:
-        """Добавление документа в историю"""
+        # Если ключ уже в кэше, запрос не нужен; иначе проверяем только
+        # наличие ключа, не читая его и не сохраняя в памяти
+        cached = self._cache_get('api_key', user_id)
+        if cached is not None:
+            return bool(cached)
+        cached = self._cache_get('has_api_key', user_id)
+        if cached is not None:
+            return cached
+        generation = self._generation('has_api_key')
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO document_history 
-                    (user_id, template_name, template_type, doc_type, content, user_request)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    user_id,
-                    doc_data.get('template_name'),
-                    doc_data.get('template_type'),
-                    doc_data.get('doc_type'),
-                    doc_data.get('content'),
-                    doc_data.get('user_request')
-                ))
-                conn.commit()
-                return True
+            row = await asyncio.to_thread(self._fetch_one, _SQL_HAS_API_KEY, (user_id,))
+            has_key = row is not None
+            self._cache_set('has_api_key', user_id, has_key, generation)
+            return has_key
         except Exception as e:
-            logger.error(f"Ошибка при добавлении в историю: {e}")
+            logger.error(f"Ошибка при проверке наличия API ключа: {e}")
             return False
     
-    def get_history(self, user_id: int) -> list:
+    @staticmethod
+    def _document_params(user_id: int, doc_data: dict) -> tuple:
+        """Параметры запроса на вставку документа в историю или избранное"""
+        return (
+            user_id,
+            doc_data.get('template_name'),
+            doc_data.get('template_type'),
+            doc_data.get('doc_type'),
+            doc_data.get('content'),
+            doc_data.get('user_request')
+        )
+    
+    async def add_to_history(self, user_id: int, doc_data: dict) -> bool:
+        """Добавление документа в историю (запись откладывается)"""
+        self._defer_write(
+            _SQL_INSERT_HISTORY, self._document_params(user_id, doc_data), 'history', user_id
+        )
+        return True
+    
+    async def get_history(self, user_id: int) -> list:
         """Получение истории документов пользователя"""
+        cached = self._cache_get('history', user_id)
+        if cached is not None:
+            return list(cached)
+        generation = self._generation('history')
+        # Отложенные записи должны быть видны при чтении
+        await self.flush()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM document_history 
-                    WHERE user_id = ? 
-                    ORDER BY date DESC 
-                    LIMIT 20
-                """, (user_id,))
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+            history = await asyncio.to_thread(self._fetch_all, _SQL_GET_HISTORY, (user_id,))
+            self._cache_set('history', user_id, history, generation)
+            return list(history)
         except Exception as e:
             logger.error(f"Ошибка при получении истории: {e}")
             return []
     
-    def clear_history(self, user_id: int) -> int:
+    async def clear_history(self, user_id: int) -> int:
         """Очистка истории пользователя"""
+        await self.flush()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT COUNT(*) FROM document_history WHERE user_id = ?", (user_id,))
-                count = cursor.fetchone()[0]
-                cursor.execute("DELETE FROM document_history WHERE user_id = ?", (user_id,))
-                conn.commit()
-                return count
+            count = await asyncio.to_thread(self._execute, _SQL_CLEAR_HISTORY, (user_id,))
+            self._invalidate('history', user_id)
+            return count
         except Exception as e:
             logger.error(f"Ошибка при очистке истории: {e}")
             return 0
     
-    def add_favorite(self, user_id: int, doc_data: dict) -> bool:
+    async def add_favorite(self, user_id: int, doc_data: dict) -> bool:
         """Добавление документа в избранное"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO favorites 
-                    (user_id, template_name, template_type, doc_type, content, user_request)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    user_id,
-                    doc_data.get('template_name'),
-                    doc_data.get('template_type'),
-                    doc_data.get('doc_type'),
-                    doc_data.get('content'),
-                    doc_data.get('user_request')
-                ))
-                conn.commit()
-                return True
+            await asyncio.to_thread(
+                self._execute, _SQL_INSERT_FAVORITE, self._document_params(user_id, doc_data)
+            )
+            self._invalidate('favorites', user_id)
+            return True
         except Exception as e:
             logger.error(f"Ошибка при добавлении в избранное: {e}")
             return False
     
-    def get_favorites(self, user_id: int) -> list:
+    async def get_favorites(self, user_id: int) -> list:
         """Получение избранных документов пользователя"""
+        cached = self._cache_get('favorites', user_id)
+        if cached is not None:
+            return list(cached)
+        generation = self._generation('favorites')
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT * FROM favorites 
-                    WHERE user_id = ? 
-                    ORDER BY date DESC
-                """, (user_id,))
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
+            favorites = await asyncio.to_thread(self._fetch_all, _SQL_GET_FAVORITES, (user_id,))
+            self._cache_set('favorites', user_id, favorites, generation)
+            return list(favorites)
         except Exception as e:
             logger.error(f"Ошибка при получении избранного: {e}")
             return []
     
-    def get_settings(self, user_id: int) -> dict:
+    async def get_settings(self, user_id: int) -> dict:
         """Получение настроек пользователя"""
+        cached = self._cache_get('settings', user_id)
+        if cached is not None:
+            return dict(cached)
+        generation = self._generation('settings')
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM user_settings WHERE user_id = ?", (user_id,))
-                row = cursor.fetchone()
-                if row:
-                    return dict(row)
-                else:
-                    cursor.execute("""
-                        INSERT INTO user_settings (user_id) VALUES (?)
-                    """, (user_id,))
-                    conn.commit()
-                    return {'language': 'ru', 'style': 'formal', 'notifications': 1}
+            row = await asyncio.to_thread(self._fetch_one, _SQL_GET_SETTINGS, (user_id,))
+            if row:
+                settings = dict(row)
+            else:
+                await asyncio.to_thread(self._execute, _SQL_INSERT_SETTINGS, (user_id,))
+                settings = {'language': 'ru', 'style': 'formal', 'notifications': 1}
+            self._cache_set('settings', user_id, settings, generation)
+            return dict(settings)
         except Exception as e:
             logger.error(f"Ошибка при получении настроек: {e}")
             return {'language': 'ru', 'style': 'formal', 'notifications': 1}
     
-    def update_setting(self, user_id: int, key: str, value) -> bool:
-        """Обновление настройки пользователя"""
+    async def update_setting(self, user_id: int, key: str, value) -> bool:
+        """
+        Обновление настройки пользователя
+        
+        Raises:
+            ValueError: Если настройки нет в ALLOWED_SETTING_KEYS
+        """
+        statement = self._SETTING_STATEMENTS.get(key)
+        if statement is None:
+            raise ValueError(f"Неизвестная настройка: {key}")
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    INSERT INTO user_settings (user_id, {key})
-                    VALUES (?, ?)
-                    ON CONFLICT(user_id) DO UPDATE SET {key} = excluded.{key}
-                """, (user_id, value))
-                conn.commit()
-                return True
+            cached = self._cache_get('settings', user_id)
+            await asyncio.to_thread(self._execute, statement, (user_id, value))
+            self._invalidate('settings', user_id)
+            # Запись сразу отражается в кэше, следующее чтение обходится без запроса
+            if cached is not None:
+                self._cache_set('settings', user_id, {**cached, key: value})
+            return True
         except Exception as e:
             logger.error(f"Ошибка при обновлении настройки: {e}")
             return False
     
-    def get_statistics(self, user_id: int) -> dict:
+    async def get_statistics(self, user_id: int) -> dict:
         """Получение статистики пользователя"""
+        cached = self._cache_get('statistics', user_id)
+        if cached is not None:
+            return dict(cached)
+        generation = self._generation('statistics')
+        # Отложенные записи должны быть видны при чтении
+        await self.flush()
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM statistics WHERE user_id = ?", (user_id,))
-                row = cursor.fetchone()
-                if row:
-                    return dict(row)
-                else:
-                    return {
-                        'total_documents': 0,
-                        'total_edits': 0,
-                        'total_words': 0,
-                        'favorite_template': 'Нет данных',
-                        'last_used': 'Никогда'
-                    }
+            row = await asyncio.to_thread(self._fetch_one, _SQL_GET_STATISTICS, (user_id,))
+            if row:
+                stats = dict(row)
+                self._cache_set('statistics', user_id, stats, generation)
+                return dict(stats)
+            else:
+                return {
+                    'total_documents': 0,
+                    'total_edits': 0,
+                    'total_words': 0,
+                    'favorite_template': 'Нет данных',
+                    'last_used': 'Никогда'
+                }
         except Exception as e:
             logger.error(f"Ошибка при получении статистики: {e}")
             return {
@@ -338,31 +690,35 @@ class UserStorage:
                 'last_used': 'Никогда'
             }
     
-    def update_statistics(self, user_id: int, template_type: str, word_count: int, is_edit: bool = False) -> bool:
-        """Обновление статистики пользователя"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                if is_edit:
-                    cursor.execute("""
-                        INSERT INTO statistics (user_id, total_edits, last_used)
-                        VALUES (?, 1, CURRENT_TIMESTAMP)
-                        ON CONFLICT(user_id) DO UPDATE SET
-                            total_edits = total_edits + 1,
-                            last_used = CURRENT_TIMESTAMP
-                    """, (user_id,))
-                else:
-                    cursor.execute("""
-                        INSERT INTO statistics (user_id, total_documents, total_words, favorite_template, last_used)
-                        VALUES (?, 1, ?, ?, CURRENT_TIMESTAMP)
-                        ON CONFLICT(user_id) DO UPDATE SET
-                            total_documents = total_documents + 1,
-                            total_words = total_words + ?,
-                            favorite_template = ?,
-                            last_used = CURRENT_TIMESTAMP
-                    """, (user_id, word_count, template_type, word_count, template_type))
-                conn.commit()
-                return True
-        except Exception as e:
-            logger.error(f"Ошибка при обновлении статистики: {e}")
-            return False
+    async def update_statistics(
+        self,
+        user_id: int,
+        template_type: str,
+        word_count: int,
+        is_edit: bool = False
+    ) -> bool:
+        """Обновление статистики пользователя (запись откладывается)"""
+        cached = self._cache_get('statistics', user_id)
+        if is_edit:
+            self._defer_write(_SQL_COUNT_EDIT, (user_id,), 'statistics', user_id)
+        else:
+            self._defer_write(
+                _SQL_COUNT_DOCUMENT,
+                (user_id, word_count, template_type, word_count, template_type),
+                'statistics',
+                user_id
+            )
+        
+        # Счётчики в кэше обновляются сразу, не дожидаясь записи в БД;
+        # last_used в том же формате, что и CURRENT_TIMESTAMP SQLite
+        if cached is not None:
+            stats = dict(cached)
+            if is_edit:
+                stats['total_edits'] += 1
+            else:
+                stats['total_documents'] += 1
+                stats['total_words'] += word_count
+                stats['favorite_template'] = template_type
+            stats['last_used'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self._cache_set('statistics', user_id, stats)
+        return True
@@ -2,6 +2,7 @@
 Простой тест для проверки работы UserStorage
 """
 
+import asyncio
 import os
 import sys
 
@@ -10,7 +11,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 from telegram_doc_bot.utils.user_storage import UserStorage
 
 
-def test_user_storage():
+async def test_user_storage():
     """Тестирование основных функций UserStorage"""
     
     db_path = "test_user_data.db"
@@ -24,35 +25,35 @@ def test_user_storage():
     test_api_key = "AIzaSyDEMOKEY1234567890abcdefghijklmn"
     
     print("1. Проверка отсутствия ключа для нового пользователя...")
-    assert not storage.has_api_key(test_user_id), "Ключ не должен существовать"
+    assert not await storage.has_api_key(test_user_id), "Ключ не должен существовать"
     print("✅ Passed")
     
     print("\n2. Сохранение API ключа...")
-    result = storage.set_api_key(test_user_id, test_api_key)
+    result = await storage.set_api_key(test_user_id, test_api_key)
     assert result, "Сохранение должно быть успешным"
     print("✅ Passed")
     
     print("\n3. Проверка наличия ключа...")
-    assert storage.has_api_key(test_user_id), "Ключ должен существовать"
+    assert await storage.has_api_key(test_user_id), "Ключ должен существовать"
     print("✅ Passed")
     
     print("\n4. Получение API ключа...")
-    retrieved_key = storage.get_api_key(test_user_id)
+    retrieved_key = await storage.get_api_key(test_user_id)
     assert retrieved_key == test_api_key, "Ключ должен совпадать с сохранённым"
     print(f"✅ Passed (получен: {retrieved_key[:15]}...)")
     
     print("\n5. Обновление API ключа...")
     new_api_key = "AIzaSyNEWKEY9876543210zyxwvutsrqponml"
-    result = storage.set_api_key(test_user_id, new_api_key)
+    result = await storage.set_api_key(test_user_id, new_api_key)
     assert result, "Обновление должно быть успешным"
-    updated_key = storage.get_api_key(test_user_id)
+    updated_key = await storage.get_api_key(test_user_id)
     assert updated_key == new_api_key, "Ключ должен быть обновлён"
     print("✅ Passed")
     
     print("\n6. Удаление API ключа...")
-    result = storage.delete_api_key(test_user_id)
+    result = await storage.delete_api_key(test_user_id)
     assert result, "Удаление должно быть успешным"
-    assert not storage.has_api_key(test_user_id), "Ключ не должен существовать после удаления"
+    assert not await storage.has_api_key(test_user_id), "Ключ не должен существовать после удаления"
     print("✅ Passed")
     
     print("\n7. Проверка работы с несколькими пользователями...")
@@ -61,13 +62,14 @@ def test_user_storage():
     key1 = "AIzaSyUSER1KEY567890abcdefghijklmnopq"
     key2 = "AIzaSyUSER2KEY567890abcdefghijklmnopq"
     
-    storage.set_api_key(user1, key1)
-    storage.set_api_key(user2, key2)
+    await storage.set_api_key(user1, key1)
+    await storage.set_api_key(user2, key2)
     
-    assert storage.get_api_key(user1) == key1, "Ключ пользователя 1 должен совпадать"
-    assert storage.get_api_key(user2) == key2, "Ключ пользователя 2 должен совпадать"
+    assert await storage.get_api_key(user1) == key1, "Ключ пользователя 1 должен совпадать"
+    assert await storage.get_api_key(user2) == key2, "Ключ пользователя 2 должен совпадать"
     print("✅ Passed")
     
+    await storage.close()
     if os.path.exists(db_path):
         os.remove(db_path)
     
@@ -78,7 +80,7 @@ def test_user_storage():
 
 if __name__ == "__main__":
     try:
-        test_user_storage()
+        asyncio.run(test_user_storage())
     except AssertionError as e:
         print(f"\n❌ Тест провален: {e}")
         sys.exit(1)
@@ -38,3 +38,21 @@ def test_max_request_length():
     
     assert Config.MAX_REQUEST_LENGTH > 0
     assert isinstance(Config.MAX_REQUEST_LENGTH, int)
+
+
+def test_document_mappings_are_read_only():
+    """Тест неизменяемости справочников конфигурации"""
+    from telegram_doc_bot.config import Config
+    
+    with pytest.raises(TypeError):
+        Config.DOCUMENT_TEMPLATES['new'] = 'Новый'
+    with pytest.raises(TypeError):
+        Config.DOCUMENT_LANGUAGES['xx'] = 'Неизвестный'
+
+
+def test_unknown_log_level_falls_back_to_info():
+    """Тест замены неизвестного уровня логирования на INFO"""
+    from telegram_doc_bot.config import _log_level
+    
+    assert _log_level('debug') == 'DEBUG'
+    assert _log_level('verbose') == 'INFO'
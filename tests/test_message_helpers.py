@@ -0,0 +1,65 @@
+"""
+Тесты для безопасной работы с сообщениями
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from telegram_doc_bot.utils import message_helpers
+from telegram_doc_bot.utils.message_helpers import safe_delete_message, safe_edit_message
+
+
+@pytest.fixture(autouse=True)
+def clear_edits(monkeypatch):
+    """Пустой кэш правок для каждого теста"""
+    monkeypatch.setattr(message_helpers, '_last_edits', type(message_helpers._last_edits)())
+
+
+def _message(message_id=1):
+    """Заглушка сообщения с успешным редактированием"""
+    message = SimpleNamespace(chat=SimpleNamespace(id=100), message_id=message_id)
+    message.edit_text = AsyncMock(return_value=message)
+    return message
+
+
+async def test_unchanged_edit_is_skipped():
+    """Тест пропуска повторной одинаковой правки без запроса к API"""
+    message = _message()
+    assert await safe_edit_message(message, "text") is message
+    assert await safe_edit_message(message, "text") is message
+    message.edit_text.assert_awaited_once()
+
+
+async def test_changed_edit_is_sent():
+    """Тест отправки правки с другим текстом или режимом разметки"""
+    message = _message()
+    await safe_edit_message(message, "text")
+    await safe_edit_message(message, "other")
+    await safe_edit_message(message, "other", parse_mode="Markdown")
+    assert message.edit_text.await_count == 3
+
+
+async def test_edits_are_tracked_per_message():
+    """Тест независимого учёта правок разных сообщений"""
+    first, second = _message(1), _message(2)
+    await safe_edit_message(first, "text")
+    await safe_edit_message(second, "text")
+    second.edit_text.assert_awaited_once()
+
+
+async def test_delete_forgets_fingerprint():
+    """Тест удаления отпечатка правки вместе с сообщением"""
+    message = _message()
+    message.delete = AsyncMock()
+    await safe_edit_message(message, "text")
+    assert await safe_delete_message(message)
+    assert (message.chat.id, message.message_id) not in message_helpers._last_edits
+
+
+async def test_switch_to_plain_text_is_sent():
+    """Тест отправки правки при переходе к обычному тексту"""
+    message = _message()
+    await safe_edit_message(message, "text")
+    await safe_edit_message(message, "text", parse_mode=None)
+    assert message.edit_text.await_count == 2
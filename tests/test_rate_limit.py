@@ -0,0 +1,60 @@
+"""
+Тесты для ограничения частоты исходящих сообщений
+"""
+
+import pytest
+from types import SimpleNamespace
+
+from telegram_doc_bot.middlewares import rate_limit
+from telegram_doc_bot.middlewares.rate_limit import RateLimitMiddleware, _TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемые часы для ведра токенов"""
+    now = SimpleNamespace(value=0.0)
+    monkeypatch.setattr(rate_limit, 'time', SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_bucket_allows_burst(clock):
+    """Тест отправки без ожидания в пределах запаса"""
+    bucket = _TokenBucket(rate=1, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_bucket_negative_balance_queues_callers(clock):
+    """Тест очереди ожидания при уходе запаса в минус"""
+    bucket = _TokenBucket(rate=2, capacity=1)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.tokens == pytest.approx(-2)
+
+
+def test_bucket_refill(clock):
+    """Тест пополнения запаса со временем, не выше ёмкости"""
+    bucket = _TokenBucket(rate=2, capacity=2)
+    bucket.reserve()
+    bucket.reserve()
+    assert bucket.reserve() == pytest.approx(0.5)
+
+    clock.value = 1.0
+    assert bucket.reserve() == 0.0
+    assert bucket.tokens == pytest.approx(0)
+
+    clock.value = 100.0
+    bucket.reserve()
+    assert bucket.tokens == pytest.approx(1)
+
+
+def test_chat_buckets_evict_least_recent(monkeypatch):
+    """Тест вытеснения давно не использованных чатов"""
+    monkeypatch.setattr(rate_limit, '_MAX_TRACKED_CHATS', 2)
+    middleware = RateLimitMiddleware()
+    first = middleware._chat_bucket(1)
+    middleware._chat_bucket(2)
+    assert middleware._chat_bucket(1) is first
+
+    middleware._chat_bucket(3)
+    assert list(middleware._chats) == [1, 3]
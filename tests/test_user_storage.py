@@ -0,0 +1,98 @@
+"""
+Тесты для отложенной записи хранилища пользователей
+"""
+
+import pytest
+
+from telegram_doc_bot.utils.user_storage import UserStorage
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    """Хранилище во временной базе данных"""
+    storage = UserStorage(str(tmp_path / "users.db"))
+    yield storage
+    await storage.close()
+
+
+def _doc(name):
+    """Данные документа для истории"""
+    return {
+        'template_name': name,
+        'template_type': 'custom',
+        'doc_type': 'pdf',
+        'content': 'text',
+        'user_request': 'request'
+    }
+
+
+async def test_failed_flush_keeps_batch(storage, monkeypatch):
+    """Тест возврата пакета в очередь при ошибке записи"""
+    execute_batch = storage._execute_batch
+
+    def failing_batch(batch):
+        raise OSError("disk I/O error")
+
+    monkeypatch.setattr(storage, '_execute_batch', failing_batch)
+    await storage.add_to_history(1, _doc('first'))
+    assert not await storage.flush()
+    assert len(storage._pending) == 1
+
+    # Новые записи встают после возвращённого пакета
+    await storage.add_to_history(1, _doc('second'))
+    monkeypatch.setattr(storage, '_execute_batch', execute_batch)
+    assert await storage.flush()
+    assert storage._pending == []
+
+    names = [item['template_name'] for item in await storage.get_history(1)]
+    assert sorted(names) == ['first', 'second']
+
+
+async def test_failed_flush_gives_up_after_retries(storage, monkeypatch):
+    """Тест отбрасывания пакета после FLUSH_MAX_RETRIES неудач"""
+    def failing_batch(batch):
+        raise OSError("disk I/O error")
+
+    monkeypatch.setattr(storage, '_execute_batch', failing_batch)
+    await storage.add_to_history(1, _doc('lost'))
+    for _ in range(storage.FLUSH_MAX_RETRIES - 1):
+        assert not await storage.flush()
+        assert len(storage._pending) == 1
+    assert not await storage.flush()
+    assert storage._pending == []
+
+
+async def test_schema_created_for_recreated_database(tmp_path):
+    """Тест создания схемы в базе, пересозданной после удаления файла"""
+    db_path = tmp_path / "users.db"
+    storage = UserStorage(str(db_path))
+    await storage.close()
+    db_path.unlink()
+
+    storage = UserStorage(str(db_path))
+    try:
+        assert await storage.set_api_key(1, "key")
+        assert await storage.get_api_key(1) == "key"
+    finally:
+        await storage.close()
+
+
+async def test_full_batch_flushes_without_waiting(storage, monkeypatch):
+    """Тест записи одним пакетом по заполнении очереди, не дожидаясь таймера"""
+    monkeypatch.setattr(storage, 'FLUSH_BATCH_SIZE', 3)
+    monkeypatch.setattr(storage, 'FLUSH_INTERVAL', 60)
+    batches = []
+    execute_batch = storage._execute_batch
+
+    def recording_batch(batch):
+        batches.append(len(batch))
+        execute_batch(batch)
+
+    monkeypatch.setattr(storage, '_execute_batch', recording_batch)
+    for name in ('first', 'second', 'third'):
+        await storage.add_to_history(1, _doc(name))
+    await storage._flush_task
+
+    assert batches == [3]
+    assert storage._pending == []
+    assert len(await storage.get_history(1)) == 3